@@ -0,0 +1,125 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from shutil import copyfile
+
+import sql_item_persistence
+from pysqlcipher3 import dbapi2 as sqlite3
+from sql_item_persistence import SqliteItemPersistence
+
+# Backs up a scratch database while another connection keeps committing writes and others keep read transactions open,
+# like the checker workers and the bot do. Compares checkpointing the wal and copying the file, which only holds back
+# writes from its own process, with copy_database_file. Reports how long backups and writes took and how many copies
+# were consistent, every write keeps the number of entries equal to the counter so a torn copy breaks that invariant.
+# Run from the repository root with the .env settings loaded: python -m benchmarks.backup_contention_benchmark
+BACKUPS = 20
+READERS = 2
+INITIAL_ENTRIES = 20000
+
+def connect(path: str):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    cursor = conn.cursor()
+    SqliteItemPersistence.set_key(cursor)
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA busy_timeout = 10000")
+    return conn
+
+def create_database(path: str):
+    conn = connect(path)
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE entries (id integer PRIMARY KEY, value text NOT NULL)")
+    cursor.execute("CREATE TABLE counter (total integer NOT NULL)")
+    cursor.execute("BEGIN")
+    cursor.executemany("INSERT INTO entries (value) VALUES (?)", [("x" * 200,) for _ in range(INITIAL_ENTRIES)])
+    cursor.execute("INSERT INTO counter VALUES (?)", (INITIAL_ENTRIES,))
+    cursor.execute("COMMIT")
+    conn.close()
+
+def write_entries(path: str, stop_event: threading.Event, write_times: list):
+    conn = connect(path)
+    cursor = conn.cursor()
+    while not stop_event.is_set():
+        start_time = time.perf_counter()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("INSERT INTO entries (value) VALUES (?)", ("x" * 200,))
+        cursor.execute("UPDATE counter SET total = total + 1")
+        cursor.execute("COMMIT")
+        write_times.append(time.perf_counter() - start_time)
+    conn.close()
+
+# holds read transactions open, which keeps the wal from being fully checkpointed
+def read_entries(path: str, stop_event: threading.Event):
+    conn = connect(path)
+    cursor = conn.cursor()
+    while not stop_event.is_set():
+        cursor.execute("BEGIN")
+        cursor.execute("SELECT COUNT(*) from entries")
+        cursor.fetchone()
+        time.sleep(0.005)
+        cursor.execute("COMMIT")
+    conn.close()
+
+def checkpoint_and_copy_file(conn, source: str, destination: str):
+    sql_item_persistence.write_lock.acquire()
+    try:
+        conn.cursor().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        copyfile(source, destination)
+    finally:
+        sql_item_persistence.write_lock.release()
+
+def copy_database_file(conn, source: str, destination: str):
+    sql_item_persistence.sqlite_item_persistence.copy_database_file(conn, destination)
+
+def is_consistent(path: str) -> bool:
+    try:
+        conn = connect(path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA integrity_check")
+            if cursor.fetchone()[0] != "ok":
+                return False
+            cursor.execute("SELECT (SELECT COUNT(*) from entries) = (SELECT total from counter)")
+            return bool(cursor.fetchone()[0])
+        finally:
+            conn.close()
+    except Exception:
+        return False
+
+def run_benchmark(name: str, backup, directory: str):
+    source = os.path.join(directory, f"{name}.db")
+    create_database(source)
+    stop_event = threading.Event()
+    write_times = []
+    threads = [threading.Thread(target=write_entries, args=(source, stop_event, write_times))]
+    threads += [threading.Thread(target=read_entries, args=(source, stop_event)) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    conn = connect(source)
+    start_time = time.perf_counter()
+    backup_times = []
+    consistent_count = 0
+    try:
+        for i in range(BACKUPS):
+            destination = os.path.join(directory, f"{name}_backup_{i}.db")
+            backup_start_time = time.perf_counter()
+            backup(conn, source, destination)
+            backup_times.append(time.perf_counter() - backup_start_time)
+            consistent_count += is_consistent(destination)
+    finally:
+        stop_event.set()
+        elapsed = time.perf_counter() - start_time
+        for thread in threads:
+            thread.join()
+        conn.close()
+    print(f"{name}: {consistent_count}/{BACKUPS} consistent copies, backup median {statistics.median(backup_times) * 1000:.1f}ms, "
+          f"{len(write_times) / elapsed:.0f} writes/s with max {max(write_times, default=0) * 1000:.1f}ms")
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        run_benchmark("checkpoint_and_copy_file", checkpoint_and_copy_file, directory)
+        run_benchmark("copy_database_file", copy_database_file, directory)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from typing import Callable
+
+import sql_item_persistence
+from pysqlcipher3 import dbapi2 as sqlite3
+from sql_item_persistence import SqliteItemPersistence
+from sql_migrations import migrate
+
+# Runs subscriber reads, as done by !get_subscribed and by the notifier loading a batch of subscribers, against notifier
+# writes of the subscribers' notification state on a scratch database with thousands of users. Compares a single
+# lock around every query with a rollback journal, which is how the database used to be accessed, with wal mode where
+# reads take no lock and buffered writes are committed together under write_lock. Reports the latency of the reads.
+# Run from the repository root with the .env settings loaded: python -m benchmarks.db_contention_benchmark
+USERS = 5000
+ITEMS = 1000
+SUBSCRIPTIONS_PER_USER = 4
+READERS = 4
+ITEMS_PER_READ_BATCH = 10
+USERS_PER_WRITE_BATCH = 200
+# both ways of accessing the database are given the same notifier write load, a way that cannot keep up writes less
+WRITE_BATCHES_PER_SECOND = 5
+DURATION = 10
+
+def connect(path: str, journal_mode: str):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    cursor = conn.cursor()
+    SqliteItemPersistence.set_key(cursor)
+    cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+    cursor.execute("PRAGMA busy_timeout = 10000")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+def get_item_url(item_index: int) -> str:
+    return f"https://www.canadacomputers.com/product_info.php?item_id={item_index}"
+
+def create_database(path: str, journal_mode: str):
+    conn = connect(path, journal_mode)
+    try:
+        migrate(conn)
+        conn.isolation_level = ""
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO items VALUES (?, 'canadacomputers', 0, 0, ?, NULL)",
+                           [(get_item_url(i), f"Item {i}") for i in range(ITEMS)])
+        stock_options = json.dumps({"price_threshold": 1000.0, "official_sites_only": False, "size_requirement": []})
+        cursor.executemany("INSERT INTO users VALUES (?, ?, 0, ?, ?, '[]', '[]')",
+                           [(user_id, stock_options, get_item_url(item_index), f"Item {item_index}")
+                            for user_id in range(USERS)
+                            for item_index in random.Random(user_id).sample(range(ITEMS), SUBSCRIPTIONS_PER_USER)])
+        conn.commit()
+    finally:
+        conn.close()
+
+def read_subscribers(path: str, journal_mode: str, run_query: Callable, stop_event: threading.Event, read_times: list):
+    persistence = sql_item_persistence.sqlite_item_persistence
+    conn = connect(path, journal_mode)
+    random_generator = random.Random()
+    while not stop_event.is_set():
+        start_time = time.perf_counter()
+        if random_generator.random() < 0.5:
+            run_query(lambda: persistence.get_all_subscribed_for_user(conn, random_generator.randrange(USERS)))
+        else:
+            item_urls = [get_item_url(i) for i in random_generator.sample(range(ITEMS), ITEMS_PER_READ_BATCH)]
+            run_query(lambda: persistence.get_subscribed_users_for_items(conn, item_urls))
+        read_times.append(time.perf_counter() - start_time)
+    conn.close()
+
+# updates the notification state of a batch of subscribers at a time, the way the notifier does after notifying them
+def write_notification_states(path: str, journal_mode: str, run_query: Callable, write_batch: Callable, stop_event: threading.Event, write_counts: list):
+    persistence = sql_item_persistence.sqlite_item_persistence
+    conn = connect(path, journal_mode)
+    random_generator = random.Random()
+    next_batch_time = time.perf_counter()
+    while not stop_event.wait(max(next_batch_time - time.perf_counter(), 0)):
+        next_batch_time += 1 / WRITE_BATCHES_PER_SECOND
+        item_urls = [get_item_url(i) for i in random_generator.sample(range(ITEMS), USERS_PER_WRITE_BATCH * ITEMS // (USERS * SUBSCRIPTIONS_PER_USER))]
+        subscribed_users = run_query(lambda: persistence.get_subscribed_users_for_items(conn, item_urls))
+        users = [user for users in subscribed_users.values() for user in users]
+        for user in users:
+            user.last_stock_status = not user.last_stock_status
+        write_batch(conn, users)
+        write_counts.append(len(users))
+    conn.close()
+
+def run_benchmark(name: str, journal_mode: str, run_query: Callable, write_batch: Callable, directory: str):
+    path = os.path.join(directory, f"{name}.db")
+    create_database(path, journal_mode)
+    stop_event = threading.Event()
+    read_times = []
+    write_counts = []
+    threads = [threading.Thread(target=write_notification_states, args=(path, journal_mode, run_query, write_batch, stop_event, write_counts))]
+    threads += [threading.Thread(target=read_subscribers, args=(path, journal_mode, run_query, stop_event, read_times)) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    read_times.sort()
+    print(f"{name}: {len(read_times) / DURATION:.0f} reads/s with median {statistics.median(read_times) * 1000:.2f}ms, "
+          f"p99 {read_times[int(len(read_times) * 0.99)] * 1000:.2f}ms and max {read_times[-1] * 1000:.2f}ms, "
+          f"{sum(write_counts) / DURATION:.0f} subscriber writes/s")
+
+def main():
+    persistence = sql_item_persistence.sqlite_item_persistence
+    global_lock = threading.Lock()
+
+    def run_query_with_global_lock(query: Callable):
+        with global_lock:
+            return query()
+
+    def write_batch_with_global_lock(conn, users):
+        for user in users:
+            with global_lock:
+                persistence.upsert_notification_user(conn, user)
+
+    def write_batch_behind(conn, users):
+        for user in users:
+            persistence.update_notification_user_state(conn, user, is_write_behind=True)
+        persistence.flush(conn)
+
+    print(f"{USERS} users subscribed to {SUBSCRIPTIONS_PER_USER} of {ITEMS} items each, {READERS} readers and one writer "
+          f"of up to {USERS_PER_WRITE_BATCH * WRITE_BATCHES_PER_SECOND} subscribers/s")
+    with tempfile.TemporaryDirectory() as directory:
+        run_benchmark("global lock", "DELETE", run_query_with_global_lock, write_batch_with_global_lock, directory)
+        run_benchmark("wal", "WAL", lambda query: query(), write_batch_behind, directory)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
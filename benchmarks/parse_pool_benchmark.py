@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from benchmarks.synthetic_pages import create_canada_computers_page
+from model.website import requests_website_dict, Website
+from services.parse_worker_service import run_parse, parse_executor
+
+# Parses large synthetic Canada Computers pages on the event loop and through the parse worker pool, reporting the
+# throughput of each and the longest the event loop was blocked, which is what delays every other stock check.
+# Run from the repository root with the .env settings loaded: python -m benchmarks.parse_pool_benchmark
+PAGES = 64
+FILLER_SECTIONS = 600
+
+async def measure_event_loop_lag(stop_event: asyncio.Event, lags: list):
+    while not stop_event.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start_time - 0.001)
+
+async def parse_inline(stock_checker, page: str):
+    for i in range(PAGES):
+        stock_checker.parse_stock_check_result(f"https://www.canadacomputers.com/product_info.php?item_id={i}", page)
+        # yields like the real loop would between results
+        await asyncio.sleep(0)
+
+async def parse_in_pool(stock_checker, page: str):
+    await asyncio.gather(*[run_parse(stock_checker.parse_stock_check_result, f"https://www.canadacomputers.com/product_info.php?item_id={i}", page)
+                           for i in range(PAGES)])
+
+async def run_benchmark(name: str, parse_pages, stock_checker, page: str):
+    stop_event = asyncio.Event()
+    lags = []
+    lag_task = asyncio.ensure_future(measure_event_loop_lag(stop_event, lags))
+    start_time = time.perf_counter()
+    await parse_pages(stock_checker, page)
+    elapsed = time.perf_counter() - start_time
+    stop_event.set()
+    await lag_task
+    print(f"{name}: {PAGES / elapsed:.1f} pages/s, max event loop lag {max(lags, default=0) * 1000:.1f}ms")
+
+async def main():
+    stock_checker = requests_website_dict[Website.CANADACOMPUTERS]
+    page = create_canada_computers_page(FILLER_SECTIONS)
+    print(f"{PAGES} pages of {len(page) // 1024}KB")
+    # starts the worker processes so their startup is not measured
+    await parse_in_pool(stock_checker, page)
+    await run_benchmark("inline", parse_inline, stock_checker, page)
+    await run_benchmark("parse pool", parse_in_pool, stock_checker, page)
+    parse_executor.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
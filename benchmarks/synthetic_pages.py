@@ -0,0 +1,37 @@
+# Builds pages shaped like the pages of the request websites, padded with unrelated markup the way real product pages
+# are, so parsing can be measured without fetching anything
+
+def create_filler(filler_sections: int) -> str:
+    return "".join(
+        f'<div class="section-{section}"><ul>' +
+        "".join(f'<li><a href="/p/{section}/{i}">Related product {i}</a><span class="price-hint">${i}.99</span></li>' for i in range(8)) +
+        f'</ul><p class="m-0 text-muted">Section {section} <strong>details</strong></p></div>'
+        for section in range(filler_sections))
+
+def create_canada_computers_store(store_location: str, tag: str, stock: str) -> str:
+    return f'<div class="store"><div><div><{tag}>{store_location}</{tag}></div></div><span class="stocknumber"><strong>{stock}</strong></span></div>'
+
+def create_canada_computers_page(filler_sections: int = 400) -> str:
+    stores = "".join([
+        create_canada_computers_store("Burnaby", "a", "0"),
+        create_canada_computers_store("Coquitlam", "a", "2"),
+        create_canada_computers_store("Grandview", "a", "0"),
+        create_canada_computers_store("Richmond", "a", "1"),
+        create_canada_computers_store("Vancouver Broadway", "a", "0"),
+        create_canada_computers_store("Online Store", "p", "5+"),
+    ])
+    return f'''<html><head><title>RTX 3080 Graphics Card</title><script>var csrf = "{filler_sections}";</script></head><body>
+<div class="header">{create_filler(filler_sections // 2)}</div>
+<p class="m-0 text-small">Item Code: 183500</p>
+<div class="col-12 order-md-1"><span class="h2-big"><strong>$1,099.99</strong></span></div>
+<div class="stores">{stores}</div>
+<div class="footer">{create_filler(filler_sections - filler_sections // 2)}</div>
+</body></html>'''
+
+def create_evga_page(filler_sections: int = 400) -> str:
+    return f'''<html><head><title>EVGA GeForce RTX 3080</title></head><body>
+<div class="header">{create_filler(filler_sections // 2)}</div>
+<div id="LFrame_pnlPrice"><span id="LFrame_spanFinalPrice"><strong>$1,299</strong><sup>.99</sup></span></div>
+<div id="LFrame_pnlCart"><a id="LFrame_btnAddToCart" href="#">Add to cart</a></div>
+<div class="footer">{create_filler(filler_sections - filler_sections // 2)}</div>
+</body></html>'''
\ No newline at end of file
@@ -0,0 +1,32 @@
+import logging
+import signal
+import sys
+import threading
+
+# Runs the stock check loops outside of the bot so stock checks can be spread over more processes and hosts.
+# Subscribed items are split between every running checker worker, including the one the bot runs as its child process
+# unless RUN_STOCK_CHECKS_IN_BOT is off, and results are queued in the database for the bot to notify subscribers.
+# Modules are imported in main since parse worker processes import this script again when they are spawned,
+# and they must not open the database or join the checker workers.
+def main():
+    import sql_item_persistence
+    from services.stock_check_loops import StockCheckLoops
+    from services.tasks.log_file_task import LogFileTask
+    from settings.settings import WORKER_ID
+
+    LogFileTask.create_new_logger("checker_worker")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    worker_membership = StockCheckLoops.start()
+    logging.info(f"Checker worker {WORKER_ID} has started")
+    try:
+        threading.Event().wait()
+    finally:
+        # lets the other workers take over this worker's items right away instead of after the heartbeat timeout
+        conn = sql_item_persistence.sqlite_item_persistence.get_connection()
+        try:
+            worker_membership.leave(conn)
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -8,7 +8,7 @@ def chunk_messages(messages: List[str], new_lines_to_add: int = 0) -> List[str]:
         if len(current_message_chunk) + len(message) < 2000:
             if current_message_chunk != "":
                 for n in range(new_lines_to_add):
-                    new_lines_to_add += "\n"
+                    current_message_chunk += "\n"
             current_message_chunk += message
         else:
             message_chunks.append(current_message_chunk)
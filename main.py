@@ -1,14 +1,15 @@
-from services.discord_message_service import DiscordMessageService
-from services.subscription_info_service import SubscriptionInfoService
-from services.subscription_service import SubscriptionService
-from discord.ext import commands
-
-from services.tasks.log_file_task import LogFileTask
-from settings.settings import DISCORD_TOKEN
+# modules are imported in main since parse worker processes import this script again when they are spawned,
+# and they must not open the database or start the bot's threads
+def main():
+    from discord.ext import commands
 
-LogFileTask.create_new_logger()
+    from services.discord_message_service import DiscordMessageService
+    from services.subscription_info_service import SubscriptionInfoService
+    from services.subscription_service import SubscriptionService
+    from services.tasks.log_file_task import LogFileTask
+    from settings.settings import DISCORD_TOKEN
 
-def main():
+    LogFileTask.create_new_logger()
     bot = commands.Bot(command_prefix='!')
     bot.remove_command("help")
     bot.add_cog(DiscordMessageService(bot))
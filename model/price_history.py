@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 import tldextract
 
@@ -7,13 +8,19 @@ from model.stock_options import StockOptions
 from model.website import Website
 from stock_checkers.stock_check_result import StockCheckResult
 
+# A price history is either a raw stock check result, or a summary of an hour or day of them once the raw ones were
+# pruned, in which case period is set and the result holds the min prices while in stock
 class PriceHistory:
-    def __init__(self, stock_check_result: StockCheckResult, stock_check_time: datetime):
+    def __init__(self, stock_check_result: StockCheckResult, stock_check_time: datetime, period: Optional[str] = None, in_stock_fraction: float = 0.0):
         self.stock_check_result: StockCheckResult = stock_check_result
         self.stock_check_time: datetime = stock_check_time
+        self.period: Optional[str] = period
+        self.in_stock_fraction: float = in_stock_fraction
 
     def format_message(self, timezone):
         localized_datetime_str = self.stock_check_time.astimezone(timezone).strftime("%m/%d/%Y, %I:%M %p")
+        if self.period is not None:
+            localized_datetime_str = f"{localized_datetime_str} ({self.period})"
         if not self.stock_check_result.is_in_stock:
             return f"{localized_datetime_str} - Not in stock"
         else:
@@ -27,7 +34,8 @@ class PriceHistory:
 
             in_stock_sizes_str = f", in-stock sizes: {get_size_requirement_str(self.stock_check_result.in_stock_sizes, False)}" if self.stock_check_result.in_stock_sizes else ""
             in_stock_stores_str = "" if not self.stock_check_result.in_stock_stores else f", in-stock location(s): {', '.join(self.stock_check_result.in_stock_stores)}"
-            return f"{localized_datetime_str} - {price_str}{in_stock_sizes_str}{in_stock_stores_str}"
+            in_stock_time_str = "" if self.period is None else f", in stock {self.in_stock_fraction:.0%} of the {self.period}"
+            return f"{localized_datetime_str} - {price_str}{in_stock_sizes_str}{in_stock_stores_str}{in_stock_time_str}"
 
     @staticmethod
     def url_to_website(url: str) -> Website:
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+from model.price_history import PriceHistory
+from stock_checkers.stock_check_result import StockCheckResult
+from stock_checkers.stock_price import StockPrice
+
+HOUR: str = "hour"
+DAY: str = "day"
+period_seconds: Dict[str, int] = {HOUR: 60 * 60, DAY: 24 * 60 * 60}
+
+def get_period_start(period: str, time: int) -> int:
+    return time - time % period_seconds[period]
+
+# Summary of an item's price history over an hour or day, kept once the raw price history of the period is pruned.
+# Prices are the min prices while the item was in stock
+class PriceHistoryRollup:
+    def __init__(self,
+                 item_url: str,
+                 period: str,
+                 period_start: int,
+                 item_name: str,
+                 stock_price: StockPrice,
+                 in_stock_seconds: int = 0,
+                 change_count: int = 0):
+        self.item_url = item_url
+        self.period = period
+        self.period_start = period_start
+        self.item_name = item_name
+        self.stock_price = stock_price
+        self.in_stock_seconds = in_stock_seconds
+        self.change_count = change_count
+
+    def add_stock_price(self, stock_price: StockPrice):
+        if stock_price.min_price < self.stock_price.min_price:
+            self.stock_price.min_price = stock_price.min_price
+            self.stock_price.min_price_str = stock_price.min_price_str
+        if stock_price.min_official_price < self.stock_price.min_official_price:
+            self.stock_price.min_official_price = stock_price.min_official_price
+            self.stock_price.min_official_price_str = stock_price.min_official_price_str
+
+    def merge(self, other: 'PriceHistoryRollup'):
+        self.add_stock_price(other.stock_price)
+        self.in_stock_seconds += other.in_stock_seconds
+        self.change_count += other.change_count
+        self.item_name = other.item_name or self.item_name
+
+    def to_price_history(self) -> PriceHistory:
+        stock_check_result = StockCheckResult(True, self.item_name, self.item_url, self.stock_price, self.in_stock_seconds > 0)
+        return PriceHistory(
+            stock_check_result,
+            datetime.fromtimestamp(self.period_start, tz=timezone.utc),
+            self.period,
+            self.in_stock_seconds / period_seconds[self.period])
+
+    @staticmethod
+    def create_empty(item_url: str, period: str, period_start: int, item_name: str) -> 'PriceHistoryRollup':
+        return PriceHistoryRollup(item_url, period, period_start, item_name, StockPrice.create_default())
+
+def get_rollup(rollups: Dict[Tuple[str, int], PriceHistoryRollup], stock_check_result: StockCheckResult, period: str, period_start: int) -> PriceHistoryRollup:
+    rollup_key = (period, period_start)
+    if rollup_key not in rollups:
+        rollups[rollup_key] = PriceHistoryRollup.create_empty(stock_check_result.item_url, period, period_start, stock_check_result.item_name)
+    return rollups[rollup_key]
+
+# adds the time from a price history until the next one to the rollups of every hour and day it overlaps
+def add_to_rollups(rollups: Dict[Tuple[str, int], PriceHistoryRollup], stock_check_result: StockCheckResult, start_time: int, end_time: int):
+    for period in period_seconds:
+        period_start = get_period_start(period, start_time)
+        get_rollup(rollups, stock_check_result, period, period_start).change_count += 1
+        while period_start < end_time:
+            rollup = get_rollup(rollups, stock_check_result, period, period_start)
+            rollup.item_name = stock_check_result.item_name or rollup.item_name
+            if stock_check_result.is_in_stock:
+                rollup.in_stock_seconds += min(end_time, period_start + period_seconds[period]) - max(start_time, period_start)
+                rollup.add_stock_price(stock_check_result.stock_price)
+            period_start += period_seconds[period]
\ No newline at end of file
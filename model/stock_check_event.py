@@ -0,0 +1,9 @@
+from model.item import Item
+from stock_checkers.stock_check_result import StockCheckResult
+
+# A stock check result waiting in the stock_check_events queue for its subscribers to be notified
+class StockCheckEvent:
+    def __init__(self, id: int, item: Item, stock_check_result: StockCheckResult):
+        self.id = id
+        self.item = item
+        self.stock_check_result = stock_check_result
\ No newline at end of file
@@ -0,0 +1,32 @@
+import math
+from typing import Dict, List
+
+from model.item import Item
+from model.website import Website, time_threshold_dict
+from settings.settings import ADAPTIVE_MIN_INTERVAL_FACTOR, ADAPTIVE_MAX_INTERVAL_FACTOR, ADAPTIVE_PRIOR_CHANGES
+
+# Spreads each website's request budget across its items according to how often their price history changes.
+# Intervals are proportional to 1 / sqrt(change count), normalized so that a website with every item unbounded
+# would be polled at the same total rate as with its fixed time threshold.
+class AdaptiveIntervalPolicy:
+    def __init__(self):
+        self.intervals: Dict[str, float] = {}
+
+    def update(self, items: List[Item], change_counts: Dict[str, int]):
+        items_by_website: Dict[Website, List[Item]] = {}
+        for item in items:
+            items_by_website.setdefault(item.website, []).append(item)
+
+        intervals = {}
+        for website, website_items in items_by_website.items():
+            base_interval = time_threshold_dict[website]
+            min_interval = base_interval * ADAPTIVE_MIN_INTERVAL_FACTOR
+            max_interval = base_interval * ADAPTIVE_MAX_INTERVAL_FACTOR
+            weights = {item.url: math.sqrt(change_counts.get(item.url, 0) + ADAPTIVE_PRIOR_CHANGES) for item in website_items}
+            mean_weight = sum(weights.values()) / len(weights)
+            for url, weight in weights.items():
+                intervals[url] = min(max(base_interval * mean_weight / weight, min_interval), max_interval)
+        self.intervals = intervals
+
+    def get_interval(self, item: Item) -> float:
+        return self.intervals.get(item.url, time_threshold_dict[item.website])
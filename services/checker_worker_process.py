@@ -0,0 +1,53 @@
+import atexit
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+from settings.settings import CHECKER_WORKER_RESTART_DELAY
+
+checker_worker_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "checker_worker.py")
+
+# Runs checker_worker.py as a child process of the bot, so the stock check loops do not share the bot's process and
+# event loop with the discord client. The child is restarted if it exits and stopped when the bot exits, on which
+# it leaves the checker workers so the other workers take over its items right away.
+class CheckerWorkerProcess:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.process: Optional[subprocess.Popen] = None
+        self.is_stopped = False
+
+    def start(self):
+        self.start_process()
+        atexit.register(self.stop)
+        threading.Thread(target=self.restart_on_exit, daemon=True).start()
+
+    def start_process(self):
+        self.process = subprocess.Popen([sys.executable, checker_worker_script])
+        logging.info(f"Started checker worker process {self.process.pid}")
+
+    def restart_on_exit(self):
+        while True:
+            return_code = self.process.wait()
+            if self.is_stopped:
+                return
+            logging.error(f"Checker worker process exited with {return_code}, restarting it in {CHECKER_WORKER_RESTART_DELAY} seconds")
+            time.sleep(CHECKER_WORKER_RESTART_DELAY)
+            with self.lock:
+                if self.is_stopped:
+                    return
+                self.start_process()
+
+    def stop(self):
+        with self.lock:
+            self.is_stopped = True
+            process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
\ No newline at end of file
@@ -7,11 +7,12 @@ import schedule
 from services.tasks.backup_db_task import BackupDatabaseTask
 from services.tasks.chrono_task import ChronoTask
 from services.tasks.log_file_task import LogFileTask
+from services.tasks.price_history_compaction_task import PriceHistoryCompactionTask
 
 class ChronoService:
     def __init__(self):
         self.executor = ThreadPoolExecutor(max_workers=3)
-        self.tasks: List[ChronoTask] = [LogFileTask(), BackupDatabaseTask()]
+        self.tasks: List[ChronoTask] = [LogFileTask(), BackupDatabaseTask(), PriceHistoryCompactionTask()]
 
     def run_threaded(self, func):
         self.executor.submit(func)
@@ -0,0 +1,67 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+
+from model.website import Website
+from settings.settings import CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_BASE_BACKOFF, CIRCUIT_BREAKER_MAX_BACKOFF
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+# Pauses every stock check of a website once requests across its items keep failing, such as when the bot gets banned.
+# Items that are no longer valid do not count as failures. Once the backoff is over a single item is checked as a trial, closing the circuit if it succeeds or pausing again
+# for twice as long if it fails. Results of checks that were already in flight when the circuit opened are ignored.
+class CircuitBreaker:
+    def __init__(self, website: Website):
+        self.website = website
+        self.lock = threading.Lock()
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.open_count = 0
+        self.open_until = datetime.fromtimestamp(0, tz=timezone.utc)
+
+    def get_backoff(self) -> timedelta:
+        return timedelta(seconds=min(CIRCUIT_BREAKER_BASE_BACKOFF * 2 ** (self.open_count - 1), CIRCUIT_BREAKER_MAX_BACKOFF))
+
+    # checks may be done while closed, and a single trial check once the backoff of an open circuit is over
+    def allow_request(self, now: datetime) -> bool:
+        with self.lock:
+            if self.state == CircuitState.OPEN and now >= self.open_until:
+                logging.info(f"Trying a single stock check of {self.website.value} after pausing checks for {self.get_backoff()}")
+                self.state = CircuitState.HALF_OPEN
+                return True
+            return self.state == CircuitState.CLOSED
+
+    # when checks that were not allowed should be tried again
+    def get_retry_time(self, now: datetime) -> datetime:
+        with self.lock:
+            if self.state == CircuitState.OPEN:
+                return self.open_until
+            return now + timedelta(seconds=CIRCUIT_BREAKER_BASE_BACKOFF)
+
+    def record_result(self, is_success: bool, now: datetime):
+        with self.lock:
+            if self.state == CircuitState.OPEN:
+                return
+            if is_success:
+                if self.state == CircuitState.HALF_OPEN:
+                    logging.info(f"Resuming stock checks of {self.website.value}")
+                self.state = CircuitState.CLOSED
+                self.consecutive_failures = 0
+                self.open_count = 0
+            elif self.state == CircuitState.HALF_OPEN:
+                self.open(now)
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+                    self.open(now)
+
+    def open(self, now: datetime):
+        self.state = CircuitState.OPEN
+        self.consecutive_failures = 0
+        self.open_count += 1
+        self.open_until = now + self.get_backoff()
+        logging.error(f"Pausing stock checks of {self.website.value} for {self.get_backoff()} after repeated failures")
\ No newline at end of file
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Dict, Callable
+
+import aiohttp
+import tldextract
+
+from services.request_limiter import RequestLimiter
+from services.response_cache import ResponseCache
+from settings.settings import MAX_CONNECTIONS_PER_HOST, KEEPALIVE_TIMEOUT, REQUEST_TIMEOUT, REQUEST_TIMEOUT_OVERRIDE_DICT
+
+# Owns one long lived, pooled aiohttp session and request limiter per website so that connections are kept alive
+# between stock checks, along with the cache of previous responses. Sessions are bound to the event loop they are
+# created on, so each loop should own its own manager. get_live_worker_count splits the request rates between workers.
+class ClientSessionManager:
+    def __init__(self, get_live_worker_count: Callable[[], int] = lambda: 1):
+        self.get_live_worker_count = get_live_worker_count
+        self.sessions: Dict[str, aiohttp.ClientSession] = {}
+        self.request_limiters: Dict[str, RequestLimiter] = {}
+        self.response_cache = ResponseCache()
+
+    @staticmethod
+    def get_domain(url: str) -> str:
+        return tldextract.extract(url).domain
+
+    def get_request_limiter(self, url: str) -> RequestLimiter:
+        domain = ClientSessionManager.get_domain(url)
+        if domain not in self.request_limiters:
+            self.request_limiters[domain] = RequestLimiter(domain, self.get_live_worker_count)
+        return self.request_limiters[domain]
+
+    @staticmethod
+    def get_timeout(url: str) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_OVERRIDE_DICT.get(ClientSessionManager.get_domain(url), REQUEST_TIMEOUT))
+
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        domain = ClientSessionManager.get_domain(url)
+        session = self.sessions.get(domain)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=MAX_CONNECTIONS_PER_HOST, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            # cookies are not shared between stock checks, same as when every check used a fresh session
+            session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self.sessions[domain] = session
+        return session
+
+    async def close(self):
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*[session.close() for session in sessions if not session.closed])
@@ -8,26 +8,29 @@ from discord.ext import commands
 
 import stock_check_result_reporter
 from conversions.message_formatters import chunk_messages
-from model import website
+from services.checker_worker_process import CheckerWorkerProcess
 from services.chrono_service import ChronoService
-from services.stock_check_loops import StockCheckLoops
+from services.stock_check_event_notifier import StockCheckEventNotifier
 from settings.messages import current_commands
+from settings.settings import RUN_STOCK_CHECKS_IN_BOT
 
 class DiscordMessageService(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.is_started = False
 
+    # on_ready is called again whenever the bot reconnects, the background work is only started once
     @commands.Cog.listener()
     async def on_ready(self):
-        executor = ThreadPoolExecutor(max_workers=3)
-        stock_check_loops = StockCheckLoops(self.bot)
         logging.info(f'{self.bot.user} has connected to Discord!')
-        loop = asyncio.get_event_loop()
+        if self.is_started:
+            return
+        self.is_started = True
+        executor = ThreadPoolExecutor(max_workers=1)
         executor.submit(ChronoService().execute)
-        if website.requests_website_dict:
-            executor.submit(stock_check_loops.run_request_stock_loop, loop)
-        if website.selenium_website_dict:
-            executor.submit(stock_check_loops.run_selenium_stock_loop, loop)
+        asyncio.ensure_future(StockCheckEventNotifier(self.bot).run())
+        if RUN_STOCK_CHECKS_IN_BOT:
+            CheckerWorkerProcess().start()
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
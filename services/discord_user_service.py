@@ -1,36 +1,69 @@
 import asyncio
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 from model.item import Item
 from model.price_history import PriceHistory
 from model.user_exception import UserException
-from model.website import Website, website_dict
+from model.website import Website, website_dict, requests_website_dict
 from model.notification_user import NotificationUser
 from datetime import datetime, timezone
 
+from services.client_session_service import ClientSessionManager
 from sql_item_persistence import sqlite_item_persistence
+import stock_check_result_reporter
+from stock_checkers.stock_check_result import StockCheckResult
 
 discord_executor = ThreadPoolExecutor(max_workers=5)
-async def subscribe(user: NotificationUser, item_url: str, website: Website) -> Item:
+# only used on the discord event loop, the stock check loops own their own sessions. Its request limits are separate
+# from the stock check workers' since subscribing only makes occasional requests when users subscribe to new items
+subscription_session_manager = ClientSessionManager()
+async def subscribe(user: NotificationUser, item_url: str, website: Website) -> Tuple[Item, List[str]]:
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(discord_executor, subscribe_sync, user, item_url, website, loop)
 
-def subscribe_sync(user: NotificationUser, item_url: str, website: Website, loop) -> Item:
+# returns the item along with the messages for the user's first status of the item
+def subscribe_sync(user: NotificationUser, item_url: str, website: Website, loop) -> Tuple[Item, List[str]]:
     conn = sqlite_item_persistence.get_connection()
     try:
         item = sqlite_item_persistence.get_item(conn, item_url)
-        if item is not None:
-            user.item_name = item.item_name
-            sqlite_item_persistence.upsert_notification_user(conn, user)
-        else:
-            item_name_future = asyncio.run_coroutine_threadsafe(website_dict[website].get_item_name_from_url(item_url, discord_executor), loop)
-            item = create_item(item_url, item_name_future.result(), website)
-            sqlite_item_persistence.insert_item_if_doesnt_exist(conn, item)
-            user.item_name = item.item_name
-            sqlite_item_persistence.upsert_notification_user(conn, user)
+        if item is None:
+            item = check_new_item(conn, item_url, website, loop)
+        user.item_name = item.item_name
+        messages = []
+        if item.last_stock_check_result is not None and item.last_stock_check_result.is_item_available:
+            is_unsubscribed, messages = stock_check_result_reporter.handle_available_stock_check_result(user, item, item.last_stock_check_result)
+            messages = [message for message in messages if message != ""]
+            if is_unsubscribed:
+                raise UserException("\n".join(messages))
+        sqlite_item_persistence.upsert_notification_user(conn, user)
     finally:
         conn.close()
+    return item, messages
+
+# new items are fully checked when first subscribed to and stored with the result, so the stock check loops
+# do not need to check them again right away
+def check_new_item(conn, item_url: str, website: Website, loop) -> Item:
+    stock_checker = website_dict[website]
+    if website not in requests_website_dict:
+        # selenium checkers need a webdriver to check stock, so only the name is looked up
+        item_name_future = asyncio.run_coroutine_threadsafe(stock_checker.get_item_name_from_url(item_url, subscription_session_manager), loop)
+        item = create_item(item_url, item_name_future.result(), website)
+        sqlite_item_persistence.insert_item_if_doesnt_exist(conn, item)
+        return item
+
+    stock_check_result_future = asyncio.run_coroutine_threadsafe(stock_checker.check_stock(item_url, subscription_session_manager), loop)
+    stock_check_result: StockCheckResult = stock_check_result_future.result()
+    stock_check_result.format_log()
+    if not stock_check_result.is_item_available:
+        raise UserException(f"Could not subscribe to {item_url}, it was invalid")
+
+    item = create_item(item_url, stock_check_result.item_name, website)
+    item.last_stock_check = datetime.now(tz=timezone.utc)
+    item.stock_status = stock_check_result.is_in_stock
+    item.last_stock_check_result = stock_check_result
+    sqlite_item_persistence.insert_price_history(conn, stock_check_result, int(item.last_stock_check.timestamp()))
+    sqlite_item_persistence.insert_item_if_doesnt_exist(conn, item)
     return item
 
 async def unsubscribe(item_url: str, user: NotificationUser):
@@ -47,16 +80,17 @@ def unsubscribe_sync(item_url: str, user: NotificationUser):
     finally:
         conn.close()
 
-def upsert_user_sync(notification_user: NotificationUser):
+# the notifier's subscriber states are buffered and committed together before the notified events are deleted
+def update_user_notification_state_sync(notification_user: NotificationUser):
     conn = sqlite_item_persistence.get_connection()
     try:
-        sqlite_item_persistence.upsert_notification_user(conn, notification_user)
+        sqlite_item_persistence.update_notification_user_state(conn, notification_user, is_write_behind=True)
     finally:
         conn.close()
 
-async def upsert_user(notification_user: NotificationUser):
+async def update_user_notification_state(notification_user: NotificationUser):
     loop = asyncio.get_event_loop()
-    await loop.run_in_executor(discord_executor, upsert_user_sync, notification_user)
+    await loop.run_in_executor(discord_executor, update_user_notification_state_sync, notification_user)
 
 def get_all_subscribed_for_user_sync(user_id: int) -> List[NotificationUser]:
     conn = sqlite_item_persistence.get_connection()
@@ -0,0 +1,13 @@
+import asyncio
+import multiprocessing
+from concurrent.futures.process import ProcessPoolExecutor
+
+from settings.settings import PARSE_WORKERS
+
+# html parsing is cpu bound, so it is done in worker processes to keep the event loops free for io.
+# spawn is used since the bot process has many threads running when the pool first starts workers
+parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+async def run_parse(parse_function, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_executor, parse_function, *args)
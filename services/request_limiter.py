@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from settings.settings import MAX_CONCURRENT_REQUESTS, MAX_CONCURRENT_REQUESTS_OVERRIDE_DICT, REQUESTS_PER_SECOND, \
+    REQUESTS_PER_SECOND_OVERRIDE_DICT, REQUEST_METRICS_LOG_INTERVAL
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill_time = time.monotonic()
+
+    def set_rate(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1)
+
+    # tokens are reserved up front and may go negative, every caller then sleeps for its share of the deficit
+    # so waiting callers are released in order at the configured rate
+    async def acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill_time) * self.rate)
+        self.last_refill_time = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+# Limits the in flight requests and requests per second to a single website and records how long requests were queued.
+# Limits are kept per process, so the requests per second are split evenly between the live stock check workers
+# given by get_live_worker_count to keep the total rate to the website the same however many workers run.
+# Must be created and used on a single event loop.
+class RequestLimiter:
+    def __init__(self, domain: str, get_live_worker_count: Callable[[], int] = lambda: 1):
+        self.domain = domain
+        self.get_live_worker_count = get_live_worker_count
+        max_concurrent_requests = int(MAX_CONCURRENT_REQUESTS_OVERRIDE_DICT.get(domain, MAX_CONCURRENT_REQUESTS))
+        self.requests_per_second = float(REQUESTS_PER_SECOND_OVERRIDE_DICT.get(domain, REQUESTS_PER_SECOND))
+        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.token_bucket = TokenBucket(self.requests_per_second, max(self.requests_per_second, 1))
+        self.queued_count = 0
+        self.total_queued_time = 0.0
+        self.max_queued_time = 0.0
+        self.last_metrics_log_time = time.monotonic()
+
+    async def __aenter__(self):
+        queued_start_time = time.monotonic()
+        await self.semaphore.acquire()
+        try:
+            self.token_bucket.set_rate(self.requests_per_second / max(self.get_live_worker_count(), 1))
+            await self.token_bucket.acquire()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        self.record_queued_time(time.monotonic() - queued_start_time)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+    def record_queued_time(self, queued_time: float):
+        self.queued_count += 1
+        self.total_queued_time += queued_time
+        self.max_queued_time = max(self.max_queued_time, queued_time)
+        now = time.monotonic()
+        if now - self.last_metrics_log_time >= REQUEST_METRICS_LOG_INTERVAL:
+            self.log_metrics()
+            self.queued_count = 0
+            self.total_queued_time = 0.0
+            self.max_queued_time = 0.0
+            self.last_metrics_log_time = now
+
+    def log_metrics(self):
+        average_queued_time = self.total_queued_time / self.queued_count if self.queued_count else 0
+        logging.info(f"{self.queued_count} requests to {self.domain} were queued for an average of {average_queued_time:.2f}s " + \
+                     f"and a max of {self.max_queued_time:.2f}s")
@@ -0,0 +1,39 @@
+import copy
+from collections import OrderedDict
+from typing import Optional
+
+from settings.settings import RESPONSE_CACHE_SIZE
+from stock_checkers.stock_check_result import StockCheckResult
+
+class CachedResponse:
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], fingerprint: str, stock_check_result: StockCheckResult):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fingerprint = fingerprint
+        self.stock_check_result = copy.deepcopy(stock_check_result)
+
+    # results are modified by the reporter, so every caller gets its own copy
+    def get_stock_check_result(self) -> StockCheckResult:
+        return copy.deepcopy(self.stock_check_result)
+
+# Remembers the validators, page fingerprint and parsed result of the last successful stock check of each url
+# so unchanged pages do not need to be downloaded or parsed again. Least recently used urls are evicted first.
+class ResponseCache:
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self.cached_responses: OrderedDict = OrderedDict()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        cached_response = self.cached_responses.get(url)
+        if cached_response is not None:
+            self.cached_responses.move_to_end(url)
+        return cached_response
+
+    def put(self, url: str, cached_response: CachedResponse):
+        self.cached_responses[url] = cached_response
+        self.cached_responses.move_to_end(url)
+        while len(self.cached_responses) > self.max_size:
+            self.cached_responses.popitem(last=False)
+
+    def remove(self, url: str):
+        self.cached_responses.pop(url, None)
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Deque
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+import sql_item_persistence
+import stock_check_result_reporter
+from model import website
+from model.item import Item
+from model.website import Website
+from services import user_agent_service
+from services.stock_check_scheduler import StockCheckScheduler
+from settings.settings import SELENIUM_CREATE_NEW_BROWSER_INTERVAL, IS_LOCAL, WEBDRIVER_URI, SELENIUM_POLITENESS_DELAY, \
+    SELENIUM_POLITENESS_DELAY_OVERRIDE_DICT, SELENIUM_PAGE_LOAD_STRATEGY, SELENIUM_BLOCK_RESOURCES, SELENIUM_BLOCKED_URL_PATTERNS, \
+    SELENIUM_STANDBY_LEAD_TIME, SELENIUM_DRIVER_RETRY_BASE_DELAY, SELENIUM_DRIVER_RETRY_MAX_DELAY
+
+blocked_content_settings = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.stylesheets": 2,
+    "profile.managed_default_content_settings.fonts": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+}
+
+def create_webdriver():
+    chrome_options = Options()
+    user_agent = user_agent_service.get_chrome_user_agent()
+    if user_agent != "":
+        chrome_options.add_argument(f'user-agent={user_agent}')
+    if not IS_LOCAL:
+        chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--log-level=3")
+    if SELENIUM_BLOCK_RESOURCES:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", blocked_content_settings)
+    capabilities = chrome_options.to_capabilities()
+    capabilities["pageLoadStrategy"] = SELENIUM_PAGE_LOAD_STRATEGY
+    logging.info(f"Creating chrome webdriver with user agent {user_agent}")
+    driver = webdriver.Chrome(WEBDRIVER_URI, desired_capabilities = capabilities)
+    if SELENIUM_BLOCK_RESOURCES:
+        # prefs do not cover every resource type, requests matching these patterns are dropped before they are sent
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": SELENIUM_BLOCKED_URL_PATTERNS})
+    return driver
+
+def quit_driver_in_background(driver):
+    def quit_driver():
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.error(e)
+    threading.Thread(target=quit_driver, daemon=True).start()
+
+# Owns the webdriver of a single worker thread. A standby webdriver is started in the background SELENIUM_STANDBY_LEAD_TIME
+# seconds before the current one is due to be recycled and is swapped in once ready, so checks never wait on chrome starting.
+# Webdrivers that fail to start are retried with exponential backoff.
+class SeleniumWorker:
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.driver = None
+        self.last_driver_time = datetime.fromtimestamp(0, tz=timezone.utc)
+        self.lock = threading.Lock()
+        self.standby_driver = None
+        self.is_standby_starting = False
+        self.failed_starts = 0
+        self.next_start_time = 0.0
+
+    def is_driver_healthy(self) -> bool:
+        try:
+            return self.driver is not None and self.driver.current_url is not None
+        except Exception as e:
+            logging.error(f"Webdriver for selenium worker {self.worker_id} is not responding: {e}")
+            return False
+
+    def get_retry_delay(self) -> float:
+        return min(SELENIUM_DRIVER_RETRY_BASE_DELAY * 2 ** (self.failed_starts - 1), SELENIUM_DRIVER_RETRY_MAX_DELAY)
+
+    # returns None if the webdriver failed to start, the next start is then delayed by the backoff
+    def try_create_driver(self):
+        try:
+            driver = create_webdriver()
+            with self.lock:
+                self.failed_starts = 0
+            return driver
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            logging.error(e)
+            with self.lock:
+                self.failed_starts += 1
+                retry_delay = self.get_retry_delay()
+                self.next_start_time = time.monotonic() + retry_delay
+            logging.error(f"Could not start webdriver for selenium worker {self.worker_id}, retrying in {retry_delay}s")
+            return None
+
+    def start_standby_driver(self):
+        with self.lock:
+            if self.standby_driver is not None or self.is_standby_starting or time.monotonic() < self.next_start_time:
+                return
+            self.is_standby_starting = True
+
+        def create_standby_driver():
+            standby_driver = self.try_create_driver()
+            with self.lock:
+                self.standby_driver = standby_driver
+                self.is_standby_starting = False
+        threading.Thread(target=create_standby_driver, daemon=True, name=f"selenium-standby-{self.worker_id}").start()
+
+    def take_standby_driver(self):
+        with self.lock:
+            standby_driver = self.standby_driver
+            self.standby_driver = None
+        return standby_driver
+
+    def swap_driver(self, new_driver):
+        if self.driver is not None:
+            quit_driver_in_background(self.driver)
+        self.driver = new_driver
+        self.last_driver_time = datetime.now(tz=timezone.utc)
+
+    def get_driver(self):
+        if not self.is_driver_healthy():
+            self.swap_driver(self.wait_for_new_driver())
+            return self.driver
+
+        now = datetime.now(tz=timezone.utc)
+        recycle_time = self.last_driver_time + timedelta(seconds=SELENIUM_CREATE_NEW_BROWSER_INTERVAL)
+        if now >= recycle_time - timedelta(seconds=SELENIUM_STANDBY_LEAD_TIME):
+            self.start_standby_driver()
+        if now >= recycle_time:
+            # the current webdriver is still used until its replacement is ready
+            new_driver = self.take_standby_driver()
+            if new_driver is not None:
+                logging.info(f"Swapping in standby webdriver for selenium worker {self.worker_id}")
+                self.swap_driver(new_driver)
+        return self.driver
+
+    # there is nothing to check with until a webdriver starts, so this blocks instead of starting one in the background
+    def wait_for_new_driver(self):
+        while True:
+            new_driver = self.take_standby_driver()
+            if new_driver is not None:
+                return new_driver
+            with self.lock:
+                is_standby_starting = self.is_standby_starting
+                retry_delay = max(self.next_start_time - time.monotonic(), 0)
+            if is_standby_starting:
+                time.sleep(1)
+                continue
+            time.sleep(retry_delay)
+            new_driver = self.try_create_driver()
+            if new_driver is not None:
+                return new_driver
+
+# Checks selenium websites with a pool of webdrivers, each running on its own thread and taking items from per website queues.
+# Requests to the same website are spaced out by that website's politeness delay no matter which worker makes them,
+# while workers keep checking other websites that are not waiting on their delay.
+class SeleniumWorkerPool:
+    def __init__(self, scheduler: StockCheckScheduler, num_workers: int):
+        self.scheduler = scheduler
+        self.workers = [SeleniumWorker(worker_id) for worker_id in range(num_workers)]
+        self.condition = threading.Condition()
+        self.pending_items: Dict[Website, Deque[Item]] = {}
+        self.next_request_times: Dict[Website, float] = {}
+
+    def start(self):
+        for worker in self.workers:
+            threading.Thread(target=self.run_worker, args=(worker,), daemon=True, name=f"selenium-worker-{worker.worker_id}").start()
+
+    def submit(self, item: Item):
+        with self.condition:
+            self.pending_items.setdefault(item.website, deque()).append(item)
+            self.condition.notify()
+
+    @staticmethod
+    def get_politeness_delay(item_website: Website) -> float:
+        return float(SELENIUM_POLITENESS_DELAY_OVERRIDE_DICT.get(item_website.value, SELENIUM_POLITENESS_DELAY))
+
+    # blocks until an item of a website that is past its politeness delay is available
+    def take_next_item(self) -> Item:
+        with self.condition:
+            while True:
+                websites_with_items = [item_website for item_website, items in self.pending_items.items() if items]
+                if not websites_with_items:
+                    self.condition.wait()
+                    continue
+                next_website = min(websites_with_items, key=lambda item_website: self.next_request_times.get(item_website, 0))
+                now = time.monotonic()
+                next_request_time = self.next_request_times.get(next_website, 0)
+                if next_request_time <= now:
+                    self.next_request_times[next_website] = now + self.get_politeness_delay(next_website)
+                    return self.pending_items[next_website].popleft()
+                self.condition.wait(next_request_time - now)
+
+    def run_worker(self, worker: SeleniumWorker):
+        conn = sql_item_persistence.sqlite_item_persistence.get_connection()
+        while True:
+            item = self.take_next_item()
+            is_page_loaded = False
+            try:
+                driver = worker.get_driver()
+                logging.info(f"Checking stock for {item.url} with selenium worker {worker.worker_id}")
+                stock_checker = website.selenium_website_dict[item.website]
+                driver.get(item.url)
+                # only failing to load the page counts against the website, a delisted item failing to render does not
+                is_page_loaded = True
+                self.scheduler.record_result(item, True)
+                stock_checker.wait_for_page_rendered(driver)
+                stock_result = stock_checker.check_stock(driver, item.url)
+                stock_result.format_log()
+                stock_check_result_reporter.handle_stock_check_result(conn, stock_result, item, datetime.now(tz=timezone.utc))
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                logging.error(e)
+                if not is_page_loaded:
+                    self.scheduler.record_result(item, False)
+            finally:
+                self.scheduler.reschedule(item)
@@ -0,0 +1,58 @@
+import asyncio
+import copy
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Tuple, Any
+from urllib.parse import urlsplit, urlunsplit
+
+from settings.settings import SINGLE_FLIGHT_TTL
+
+def normalize_url(url: str) -> str:
+    split_url = urlsplit(url.strip())
+    return urlunsplit((split_url.scheme.lower(), split_url.netloc.lower(), split_url.path or "/", split_url.query, ""))
+
+# Shares one in flight call between concurrent callers with the same key, even from different threads and event loops,
+# and keeps its result for SINGLE_FLIGHT_TTL seconds so callers shortly after reuse it too.
+# Results are shared between callers, so every caller gets its own copy.
+class SingleFlight:
+    def __init__(self, ttl: float = SINGLE_FLIGHT_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Tuple[str, str], Future] = {}
+        self.results: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+
+    def remove_expired_results(self, now: float):
+        for key in [key for key, (expiry_time, _) in self.results.items() if expiry_time <= now]:
+            del self.results[key]
+
+    async def run(self, kind: str, url: str, coroutine_function, *args):
+        key = (kind, normalize_url(url))
+        with self.lock:
+            now = time.monotonic()
+            self.remove_expired_results(now)
+            if key in self.results:
+                return copy.deepcopy(self.results[key][1])
+            future = self.in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not is_leader:
+            return copy.deepcopy(await asyncio.wrap_future(future))
+
+        try:
+            result = await coroutine_function(*args)
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            self.results[key] = (time.monotonic() + self.ttl, result)
+        future.set_result(result)
+        return copy.deepcopy(result)
+
+single_flight = SingleFlight()
\ No newline at end of file
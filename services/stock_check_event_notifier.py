@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import traceback
+from collections import OrderedDict
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import List, Dict
+
+import stock_check_result_reporter
+from model.notification_user import NotificationUser
+from model.stock_check_event import StockCheckEvent
+from settings.settings import NOTIFIER_POLL_INTERVAL, NOTIFIER_BATCH_SIZE
+from sql_item_persistence import sqlite_item_persistence
+
+# Notifies subscribers of the results queued in the stock_check_events table by the stock check loops, which run in
+# checker workers, including the one the bot runs as its child process. Database work runs on its own thread so it never blocks the bot's event loop.
+# Events are deleted once their subscribers have been notified, so events of a batch that was interrupted by the bot
+# stopping are notified again when it restarts.
+class StockCheckEventNotifier:
+    def __init__(self, bot):
+        self.bot = bot
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def get_stock_check_events_sync(max_to_retrieve: int) -> List[StockCheckEvent]:
+        conn = sqlite_item_persistence.get_connection()
+        try:
+            stock_check_events = sqlite_item_persistence.get_stock_check_events(conn, max_to_retrieve)
+        finally:
+            conn.close()
+        return stock_check_events
+
+    @staticmethod
+    def get_subscribed_users_sync(item_urls: List[str]) -> Dict[str, List[NotificationUser]]:
+        conn = sqlite_item_persistence.get_connection()
+        try:
+            subscribed_users_by_item_url = sqlite_item_persistence.get_subscribed_users_for_items(conn, item_urls)
+        finally:
+            conn.close()
+        return subscribed_users_by_item_url
+
+    @staticmethod
+    def delete_stock_check_events_through_sync(last_id: int):
+        conn = sqlite_item_persistence.get_connection()
+        try:
+            sqlite_item_persistence.delete_stock_check_events_through(conn, last_id)
+        finally:
+            conn.close()
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            stock_check_events = []
+            try:
+                stock_check_events = await loop.run_in_executor(self.executor, self.get_stock_check_events_sync, NOTIFIER_BATCH_SIZE)
+                await self.notify_all_subscribers(stock_check_events)
+                if stock_check_events:
+                    await loop.run_in_executor(self.executor, self.delete_stock_check_events_through_sync, stock_check_events[-1].id)
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                logging.error(e)
+            if len(stock_check_events) < NOTIFIER_BATCH_SIZE:
+                await asyncio.sleep(NOTIFIER_POLL_INTERVAL)
+
+    # events of different items are notified concurrently, events of the same item in the order they were checked.
+    # Subscribers of the whole batch are loaded with a single query up front
+    async def notify_all_subscribers(self, stock_check_events: List[StockCheckEvent]):
+        if not stock_check_events:
+            return
+        stock_check_events_by_item_url = OrderedDict()
+        for stock_check_event in stock_check_events:
+            stock_check_events_by_item_url.setdefault(stock_check_event.item.url, []).append(stock_check_event)
+        loop = asyncio.get_event_loop()
+        subscribed_users_by_item_url = await loop.run_in_executor(self.executor, self.get_subscribed_users_sync, list(stock_check_events_by_item_url.keys()))
+        await asyncio.gather(*[self.notify_item_subscribers(item_stock_check_events, subscribed_users_by_item_url.get(item_url, []))
+                               for item_url, item_stock_check_events in stock_check_events_by_item_url.items()])
+
+    # the subscribers are updated in place as each event is notified, so the item's next event sees their latest state
+    # without reading it back from the database
+    async def notify_item_subscribers(self, item_stock_check_events: List[StockCheckEvent], subscribed_users: List[NotificationUser]):
+        for stock_check_event in item_stock_check_events:
+            results = await asyncio.gather(
+                *[stock_check_result_reporter.notify_valid_subscribers(subscribed_user, stock_check_event.item, stock_check_event.stock_check_result, self.bot)
+                  for subscribed_user in subscribed_users],
+                return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logging.error(result)
+            subscribed_users = [subscribed_user for subscribed_user, is_unsubscribed in zip(subscribed_users, results) if is_unsubscribed is not True]
\ No newline at end of file
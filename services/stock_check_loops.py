@@ -1,109 +1,147 @@
 import asyncio
 import logging
-import time
+import threading
 import traceback
 from datetime import datetime, timezone, timedelta
-
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from typing import List
 
 import sql_item_persistence
 import stock_check_result_reporter
 from model import website
-from model.website import time_threshold_dict
-from services import user_agent_service
-from settings.settings import SELENIUM_TIME_THRESHOLD, OFFSET_BETWEEN_FAILS, SELENIUM_CREATE_NEW_BROWSER_INTERVAL, \
-    IS_LOCAL, WEBDRIVER_URI, REQUESTS_TIME_THRESHOLD
-from stock_checkers.stock_check_result import StockCheckResult
+from model.item import Item
+from services.client_session_service import ClientSessionManager
+from services.selenium_worker_pool import SeleniumWorkerPool
+from services.stock_check_scheduler import StockCheckScheduler, add_subscription_change_listener, \
+    remove_subscription_change_listener
+from services.worker_membership import WorkerMembership
+from settings.settings import RESULTS_QUEUE_SIZE, ADAPTIVE_INTERVALS_ENABLED, ADAPTIVE_INTERVAL_WINDOW, SELENIUM_WORKERS
 
 class StockCheckLoops:
-    def __init__(self, bot):
-        self.bot = bot
+    def __init__(self, worker_membership: WorkerMembership):
+        self.worker_membership = worker_membership
 
-    def run_selenium_stock_loop(self, main_thread_loop):
-        last_driver_time = datetime.fromtimestamp(0)
-        driver = None
+    # joins the stock check workers and runs the stock check loops on their own threads
+    @staticmethod
+    def start() -> WorkerMembership:
+        worker_membership = WorkerMembership()
+        worker_membership.start()
+        stock_check_loops = StockCheckLoops(worker_membership)
+        if website.requests_website_dict:
+            threading.Thread(target=stock_check_loops.run_request_stock_loop, daemon=True, name="request-stock-loop").start()
+        if website.selenium_website_dict:
+            threading.Thread(target=stock_check_loops.run_selenium_stock_loop, daemon=True, name="selenium-stock-loop").start()
+        return worker_membership
 
-        persistence = sql_item_persistence.sqlite_item_persistence
+    def run_selenium_stock_loop(self):
         conn = sql_item_persistence.sqlite_item_persistence.get_connection()
         websites_to_process = list(map(lambda x: x.value, list(website.selenium_website_dict.keys())))
+        scheduler = StockCheckScheduler()
+        wake_event = threading.Event()
+        scheduler.wake = wake_event.set
+        add_subscription_change_listener(scheduler.request_sync)
+        worker_pool = SeleniumWorkerPool(scheduler, SELENIUM_WORKERS)
+        worker_pool.start()
 
         while True:
             try:
-                driver, last_driver_time = self.create_webdriver_if_needed(driver, last_driver_time)
-            except Exception as e:
-                logging.error(traceback.format_exc())
-                logging.error(e)
-                break
-            try:
-                items = persistence.get_items(conn, int((datetime.now(tz=timezone.utc) - timedelta(seconds = SELENIUM_TIME_THRESHOLD)).timestamp()), websites_to_process)
-                if items:
-                    for item in items:
-                        if self.should_check_item(item):
-                            logging.info(f"Checking stock for {item.url}")
-                            driver.get(item.url)
-                            stock_result: StockCheckResult = website.selenium_website_dict[item.website].check_stock(driver, item.url)
-                            stock_result.format_log()
-                            stock_check_result_reporter.handle_stock_check_result(conn, stock_result, item, main_thread_loop, datetime.now(tz=timezone.utc), self.bot)
-                            time.sleep(5)
-                    time.sleep(5)
-                else:
-                    time.sleep(10)
+                wake_event.clear()
+                self.poll_subscription_version(conn, scheduler)
+                if scheduler.should_sync(datetime.now(tz=timezone.utc)):
+                    self.sync_scheduler(conn, scheduler, websites_to_process, self.worker_membership)
+                for item in scheduler.pop_due_items(datetime.now(tz=timezone.utc)):
+                    worker_pool.submit(item)
             except Exception as e:
                 logging.error(traceback.format_exc())
                 logging.error(e)
+            wake_event.wait(scheduler.get_seconds_until_next_check(datetime.now(tz=timezone.utc)))
 
+    # subscription changes are made by the bot's process, the version is read before the items so a change made in between
+    # is caught by the next poll
     @staticmethod
-    def should_check_item(item) -> bool:
-        return item.last_stock_check + timedelta(seconds=time_threshold_dict[item.website]) < datetime.now(tz=timezone.utc) and \
-               (item.last_stock_check_result is None or
-                item.last_stock_check_result.fail_count == 0 or
-                item.last_stock_check + timedelta(seconds=OFFSET_BETWEEN_FAILS) <= datetime.now(tz=timezone.utc))
+    def poll_subscription_version(conn, scheduler: StockCheckScheduler):
+        now = datetime.now(tz=timezone.utc)
+        if scheduler.should_poll_subscription_version(now):
+            scheduler.set_subscription_version(sql_item_persistence.sqlite_item_persistence.get_subscription_version(conn), now)
 
+    # only the items owned by this worker are scheduled, the rest are checked by the other live workers.
+    # Buffered results are committed first so the items read back are not older than the scheduled ones
     @staticmethod
-    def create_webdriver_if_needed(driver, last_driver_time):
-        if driver is None or last_driver_time + timedelta(seconds=SELENIUM_CREATE_NEW_BROWSER_INTERVAL) < datetime.now(tz = timezone.utc):
-            if driver is not None:
-                driver.quit()
-            chrome_options = Options()
-            user_agent = user_agent_service.get_chrome_user_agent()
-            if user_agent != "":
-                chrome_options.add_argument(f'user-agent={user_agent}')
-            if not IS_LOCAL:
-                chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--log-level=3")
-            logging.info(f"Creating chrome webdriver with user agent {user_agent}")
-            driver = webdriver.Chrome(WEBDRIVER_URI, options = chrome_options)
-            last_driver_time = datetime.now(tz=timezone.utc)
-        return driver, last_driver_time
+    def sync_scheduler(conn, scheduler: StockCheckScheduler, websites_to_process: List[str], worker_membership: WorkerMembership):
+        persistence = sql_item_persistence.sqlite_item_persistence
+        persistence.flush(conn)
+        items = worker_membership.filter_owned(persistence.get_subscribed_items(conn, websites_to_process))
+        change_counts = None
+        if ADAPTIVE_INTERVALS_ENABLED:
+            since_stock_check_time = int((datetime.now(tz=timezone.utc) - timedelta(seconds=ADAPTIVE_INTERVAL_WINDOW)).timestamp())
+            change_counts = persistence.get_price_history_change_counts(conn, since_stock_check_time)
+        scheduler.sync(items, change_counts)
 
-    def run_request_stock_loop(self, main_thread_loop):
+    def run_request_stock_loop(self):
         request_loop = asyncio.new_event_loop()
-        request_loop.run_until_complete(self.request_stock_loop(main_thread_loop))
+        request_loop.run_until_complete(self.request_stock_loop())
 
-    async def request_stock_loop(self, main_thread_loop):
-        persistence = sql_item_persistence.sqlite_item_persistence
+    async def request_stock_loop(self):
         conn = sql_item_persistence.sqlite_item_persistence.get_connection()
         websites_to_process = list(map(lambda x: x.value, list(website.requests_website_dict.keys())))
-        while True:
-            try:
-                items = persistence.get_items(conn, int((datetime.now(tz=timezone.utc) - timedelta(seconds=REQUESTS_TIME_THRESHOLD)).timestamp()), websites_to_process)
-                tasks = []
-                items_dict = {}
-
-                for item in items:
-                    if self.should_check_item(item):
+        session_manager = ClientSessionManager(self.worker_membership.get_live_worker_count)
+        scheduler = StockCheckScheduler()
+        wake_event = asyncio.Event()
+        request_loop = asyncio.get_running_loop()
+        scheduler.wake = lambda: request_loop.call_soon_threadsafe(wake_event.set)
+        add_subscription_change_listener(scheduler.request_sync)
+        results_queue = asyncio.Queue(maxsize=RESULTS_QUEUE_SIZE)
+        check_tasks = set()
+        report_task = asyncio.ensure_future(self.report_stock_check_results(conn, results_queue, scheduler))
+        try:
+            while True:
+                try:
+                    wake_event.clear()
+                    self.poll_subscription_version(conn, scheduler)
+                    if scheduler.should_sync(datetime.now(tz=timezone.utc)):
+                        self.sync_scheduler(conn, scheduler, websites_to_process, self.worker_membership)
+                    for item in scheduler.pop_due_items(datetime.now(tz=timezone.utc)):
                         logging.info(f"Checking stock for {item.url}")
-                        items_dict[item.url] = item
-                        tasks.append(website.requests_website_dict[item.website].check_stock(item.url))
+                        check_task = asyncio.ensure_future(self.check_stock(item, session_manager, results_queue, scheduler))
+                        check_tasks.add(check_task)
+                        check_task.add_done_callback(check_tasks.discard)
+                except Exception as e:
+                    logging.error(traceback.format_exc())
+                    logging.error(e)
+                try:
+                    await asyncio.wait_for(wake_event.wait(), scheduler.get_seconds_until_next_check(datetime.now(tz=timezone.utc)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            remove_subscription_change_listener(scheduler.request_sync)
+            for task in [report_task, *check_tasks]:
+                task.cancel()
+            await session_manager.close()
 
-                stock_check_results = await asyncio.gather(*tasks)
-                stock_check_time = datetime.now(tz=timezone.utc)
-                for stock_check_result in stock_check_results:
-                    stock_check_result.format_log()
-                    item = items_dict[stock_check_result.item_url]
-                    stock_check_result_reporter.handle_stock_check_result(conn, stock_check_result, item, main_thread_loop, stock_check_time, self.bot)
+    @staticmethod
+    async def check_stock(item: Item, session_manager: ClientSessionManager, results_queue: asyncio.Queue, scheduler: StockCheckScheduler):
+        try:
+            stock_check_result = await website.requests_website_dict[item.website].check_stock(item.url, session_manager)
+            scheduler.record_result(item, not stock_check_result.is_request_failure)
+            await results_queue.put((item, stock_check_result))
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            logging.error(e)
+            scheduler.record_result(item, False)
+            scheduler.reschedule(item)
+
+    # reports each result as soon as its check completes so one slow website does not hold back alerts for the others
+    async def report_stock_check_results(self, conn, results_queue: asyncio.Queue, scheduler: StockCheckScheduler):
+        while True:
+            item, stock_check_result = await results_queue.get()
+            try:
+                stock_check_result.format_log()
+                stock_check_result_reporter.handle_stock_check_result(conn, stock_check_result, item, datetime.now(tz=timezone.utc))
+                # the cycle's buffered writes are committed together once every completed check has been reported
+                if results_queue.empty():
+                    sql_item_persistence.sqlite_item_persistence.flush(conn)
             except Exception as e:
                 logging.error(traceback.format_exc())
                 logging.error(e)
-            time.sleep(10)
\ No newline at end of file
+            finally:
+                scheduler.reschedule(item)
+                results_queue.task_done()
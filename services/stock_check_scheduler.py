@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Callable, Optional, Set, Tuple
+
+from model.item import Item
+from model.website import Website
+from services.adaptive_interval_service import AdaptiveIntervalPolicy
+from services.circuit_breaker import CircuitBreaker, CircuitState
+from settings.settings import OFFSET_BETWEEN_FAILS, SCHEDULER_RESYNC_INTERVAL, SUBSCRIPTION_VERSION_POLL_INTERVAL
+
+# listeners in this process, such as the schedulers when the live workers change which items this worker owns.
+# Subscription changes made by the bot reach the checker workers through the polled subscription version
+subscription_change_listeners: List[Callable[[], None]] = []
+
+def add_subscription_change_listener(listener: Callable[[], None]):
+    subscription_change_listeners.append(listener)
+
+def remove_subscription_change_listener(listener: Callable[[], None]):
+    if listener in subscription_change_listeners:
+        subscription_change_listeners.remove(listener)
+
+def notify_subscriptions_changed():
+    for listener in list(subscription_change_listeners):
+        listener()
+
+# Keeps a min heap of subscribed items keyed by the time they are next due to be checked.
+# Stale heap entries (rescheduled or unsubscribed items) are skipped lazily when popped.
+# Due items of websites whose circuit breaker is open are pushed back until the breaker allows checks again.
+# The trial check of a paused website is of an item that was available when last checked, so a delisted item
+# failing again does not keep the website paused.
+class StockCheckScheduler:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.heap: List[Tuple[datetime, int, str]] = []
+        self.counter = itertools.count()
+        self.items: Dict[str, Item] = {}
+        self.scheduled_times: Dict[str, datetime] = {}
+        self.in_progress: Set[str] = set()
+        self.is_sync_needed = True
+        self.last_sync_time = datetime.fromtimestamp(0, tz=timezone.utc)
+        self.subscription_version: Optional[int] = None
+        self.last_subscription_version_poll_time = datetime.fromtimestamp(0, tz=timezone.utc)
+        self.wake: Optional[Callable[[], None]] = None
+        self.interval_policy = AdaptiveIntervalPolicy()
+        self.circuit_breakers: Dict[Website, CircuitBreaker] = {}
+
+    def get_next_check_time(self, item: Item) -> datetime:
+        next_check_time = item.last_stock_check + timedelta(seconds=self.interval_policy.get_interval(item))
+        if item.last_stock_check_result is not None and item.last_stock_check_result.fail_count > 0:
+            next_check_time = max(next_check_time, item.last_stock_check + timedelta(seconds=OFFSET_BETWEEN_FAILS))
+        return next_check_time
+
+    def request_sync(self):
+        self.is_sync_needed = True
+        if self.wake is not None:
+            self.wake()
+
+    def should_sync(self, now: datetime) -> bool:
+        return self.is_sync_needed or self.last_sync_time + timedelta(seconds=SCHEDULER_RESYNC_INTERVAL) <= now
+
+    def get_next_subscription_version_poll_time(self) -> datetime:
+        return self.last_subscription_version_poll_time + timedelta(seconds=SUBSCRIPTION_VERSION_POLL_INTERVAL)
+
+    def should_poll_subscription_version(self, now: datetime) -> bool:
+        return self.get_next_subscription_version_poll_time() <= now
+
+    # subscription changes made by any process bump the subscription version, which requests a sync
+    def set_subscription_version(self, subscription_version: int, now: datetime):
+        self.last_subscription_version_poll_time = now
+        if subscription_version != self.subscription_version:
+            self.subscription_version = subscription_version
+            self.is_sync_needed = True
+
+    # items should be every currently subscribed item that this scheduler is responsible for,
+    # change_counts are the number of price history changes per item url used to adapt check intervals.
+    # A scheduled item checked more recently than the one read, such as when its result failed to be written, is kept
+    def sync(self, items: List[Item], change_counts: Optional[Dict[str, int]] = None):
+        with self.lock:
+            if change_counts is not None:
+                self.interval_policy.update(items, change_counts)
+            self.is_sync_needed = False
+            self.last_sync_time = datetime.now(tz=timezone.utc)
+            subscribed_urls = set()
+            for item in items:
+                subscribed_urls.add(item.url)
+                if item.url not in self.in_progress:
+                    scheduled_item = self.items.get(item.url)
+                    if scheduled_item is not None and scheduled_item.last_stock_check > item.last_stock_check:
+                        item = scheduled_item
+                    self.items[item.url] = item
+                    self.push(item)
+
+            for url in list(self.items.keys()):
+                if url not in subscribed_urls:
+                    del self.items[url]
+                    self.scheduled_times.pop(url, None)
+
+    def get_circuit_breaker(self, item_website: Website) -> CircuitBreaker:
+        with self.lock:
+            if item_website not in self.circuit_breakers:
+                self.circuit_breakers[item_website] = CircuitBreaker(item_website)
+            return self.circuit_breakers[item_website]
+
+    # records whether a popped item's website responded, failed requests across the items of a website may pause the website
+    def record_result(self, item: Item, is_success: bool):
+        self.get_circuit_breaker(item.website).record_result(is_success, datetime.now(tz=timezone.utc))
+
+    # the due item if it was available when last checked, otherwise another such item of the website if there is one
+    def get_canary_item(self, item: Item) -> Item:
+        for candidate in [item, *self.items.values()]:
+            if candidate.website == item.website and candidate.url not in self.in_progress and \
+                    candidate.last_stock_check_result is not None and candidate.last_stock_check_result.is_item_available:
+                return candidate
+        return item
+
+    # returns whether the item is now the next one due, in which case the loop's wait has to be cut short
+    def push(self, item: Item, next_check_time: Optional[datetime] = None) -> bool:
+        if next_check_time is None:
+            next_check_time = self.get_next_check_time(item)
+        if self.scheduled_times.get(item.url) != next_check_time:
+            self.scheduled_times[item.url] = next_check_time
+            entry = (next_check_time, next(self.counter), item.url)
+            heapq.heappush(self.heap, entry)
+            while self.is_stale(self.heap[0]):
+                heapq.heappop(self.heap)
+            return self.heap[0] is entry
+        return False
+
+    def wake_if_needed(self, is_new_next_item: bool):
+        if is_new_next_item and self.wake is not None:
+            self.wake()
+
+    def is_stale(self, entry: Tuple[datetime, int, str]) -> bool:
+        next_check_time, _, url = entry
+        return url not in self.items or url in self.in_progress or self.scheduled_times.get(url) != next_check_time
+
+    def pop_due_items(self, now: datetime) -> List[Item]:
+        due_items = []
+        deferred_items = []
+        with self.lock:
+            while self.heap and (self.is_stale(self.heap[0]) or self.heap[0][0] <= now):
+                entry = heapq.heappop(self.heap)
+                if not self.is_stale(entry):
+                    url = entry[2]
+                    item = self.items[url]
+                    del self.scheduled_times[url]
+                    circuit_breaker = self.get_circuit_breaker(item.website)
+                    if not circuit_breaker.allow_request(now):
+                        deferred_items.append((item, circuit_breaker.get_retry_time(now)))
+                        continue
+                    if circuit_breaker.state == CircuitState.HALF_OPEN:
+                        canary_item = self.get_canary_item(item)
+                        if canary_item is not item:
+                            deferred_items.append((item, circuit_breaker.get_retry_time(now)))
+                            self.scheduled_times.pop(canary_item.url, None)
+                            item = canary_item
+                    self.in_progress.add(item.url)
+                    due_items.append(item)
+            is_new_next_item = False
+            for item, retry_time in deferred_items:
+                is_new_next_item = self.push(item, retry_time) or is_new_next_item
+        self.wake_if_needed(is_new_next_item)
+        return due_items
+
+    # called once a popped item has been checked so that it is scheduled again
+    def reschedule(self, item: Item):
+        is_new_next_item = False
+        with self.lock:
+            self.in_progress.discard(item.url)
+            if item.url in self.items:
+                self.items[item.url] = item
+                is_new_next_item = self.push(item)
+        self.wake_if_needed(is_new_next_item)
+
+    def get_seconds_until_next_check(self, now: datetime) -> float:
+        with self.lock:
+            while self.heap and self.is_stale(self.heap[0]):
+                heapq.heappop(self.heap)
+            next_wake_time = min(self.last_sync_time + timedelta(seconds=SCHEDULER_RESYNC_INTERVAL), self.get_next_subscription_version_poll_time())
+            if self.heap:
+                next_wake_time = min(next_wake_time, self.heap[0][0])
+        return max((next_wake_time - now).total_seconds(), 0)
@@ -10,11 +10,13 @@ from discord.ext import commands
 from conversions.url_conversions import to_stock_check_url
 from services import discord_user_service
 from conversions.conversions import str2bool, str2size
+from conversions.message_formatters import chunk_messages
 from conversions.size_formatters import get_size_requirement_str
 from model.notification_user import NotificationUser
 from model.stock_options import StockOptions
 from model.user_exception import UserException
 from settings.messages import subscribe_help_message
+from stock_check_result_reporter import send_message
 
 class SubscriptionService(commands.Cog):
     def __init__(self, bot):
@@ -42,7 +44,7 @@ class SubscriptionService(commands.Cog):
                 try:
                     stock_check_url, website = to_stock_check_url(url)
                     notification_user = self.to_notification_user(ctx, stock_options, stock_check_url)
-                    item = await discord_user_service.subscribe(notification_user, stock_check_url, website)
+                    item, messages = await discord_user_service.subscribe(notification_user, stock_check_url, website)
 
                     item_name_to_use = item.item_name if item.item_name != "" and item.item_name is not None else url
                     price_text = f"goes below or equal to ${stock_options.price_threshold:.2f}" if stock_options.price_threshold < math.inf else "is in stock"
@@ -50,6 +52,8 @@ class SubscriptionService(commands.Cog):
                     size_joined_str = get_size_requirement_str(stock_options.size_requirement)
                     size = f" with size(s) {size_joined_str}" if stock_options.size_requirement else ""
                     response = f"Successfully subscribed to be notified when **{item_name_to_use}** {price_text}{size} {source}"
+                    for message in chunk_messages(messages, 2):
+                        await send_message(ctx.message.author.id, message, self.bot)
                 except UserException as ue:
                     response = str(ue)
                 except Exception as e:
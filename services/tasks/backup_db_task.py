@@ -1,10 +1,11 @@
 import logging
 import os
 
+import sql_item_persistence
+
 from services.tasks.chrono_task import ChronoTask
 from settings.chrono_task_settings import DB_BACKUP_FREQUENCY
 from settings.settings import DB_NAME
-from shutil import copyfile
 
 class BackupDatabaseTask(ChronoTask):
     def __init__(self):
@@ -19,7 +20,11 @@ class BackupDatabaseTask(ChronoTask):
 
             for i in range(1, 5):
                 try:
-                    copyfile(DB_NAME, f"db_backup/backup_{time_formatted}.db")
+                    conn = sql_item_persistence.sqlite_item_persistence.get_connection()
+                    try:
+                        sql_item_persistence.sqlite_item_persistence.copy_database_file(conn, f"db_backup/backup_{time_formatted}.db")
+                    finally:
+                        conn.close()
                     logging.info("Successfully backed up database")
                     return
                 except Exception as e:
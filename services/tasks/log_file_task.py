@@ -12,7 +12,7 @@ class LogFileTask(ChronoTask):
         LogFileTask.create_new_logger()
 
     @staticmethod
-    def create_new_logger():
+    def create_new_logger(log_name: str = "debug"):
         logging.info("Creating a new logger")
         time_formatted = ChronoTask.format_time()
         logger = logging.getLogger()
@@ -23,7 +23,7 @@ class LogFileTask(ChronoTask):
 
         if not os.path.exists("logs"):
             os.makedirs("logs")
-        file_handler = logging.FileHandler(f"logs/debug{time_formatted}.log", mode="w")
+        file_handler = logging.FileHandler(f"logs/{log_name}{time_formatted}.log", mode="w")
         file_handler.setLevel(logging.WARNING)
         file_handler.formatter = formatter
 
@@ -0,0 +1,35 @@
+import logging
+import traceback
+from datetime import datetime, timezone
+
+import sql_item_persistence
+
+from model.price_history_rollup import get_period_start, DAY
+from services.tasks.chrono_task import ChronoTask
+from settings.chrono_task_settings import PRICE_HISTORY_COMPACTION_FREQUENCY
+from settings.settings import PRICE_HISTORY_RAW_RETENTION, PRICE_HISTORY_HOURLY_RETENTION, PRICE_HISTORY_COMPACTION_BATCH_SIZE
+
+# Summarizes raw price histories past their retention into hourly and daily rollups a batch of items at a time,
+# then prunes the hourly rollups past theirs
+class PriceHistoryCompactionTask(ChronoTask):
+    def __init__(self):
+        super().__init__(PRICE_HISTORY_COMPACTION_FREQUENCY)
+
+    def execute(self):
+        persistence = sql_item_persistence.sqlite_item_persistence
+        now = int(datetime.now(tz=timezone.utc).timestamp())
+        conn = persistence.get_connection()
+        try:
+            last_item_url = ""
+            compacted_batches = 0
+            while last_item_url is not None:
+                last_item_url = persistence.compact_price_histories(conn, last_item_url, now - PRICE_HISTORY_RAW_RETENTION, PRICE_HISTORY_COMPACTION_BATCH_SIZE)
+                compacted_batches += 1
+            # hourly rollups are pruned whole days at a time, so readers can use daily rollups for the days before them
+            persistence.delete_hourly_price_history_rollups_before(conn, get_period_start(DAY, now - PRICE_HISTORY_HOURLY_RETENTION))
+            logging.info(f"Compacted price histories in {compacted_batches - 1} batches")
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            logging.error(e)
+        finally:
+            conn.close()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import hashlib
+import logging
+import threading
+import time
+import traceback
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+import sql_item_persistence
+from model.item import Item
+from services.stock_check_scheduler import notify_subscriptions_changed
+from settings.settings import WORKER_ID, WORKER_HEARTBEAT_INTERVAL, WORKER_HEARTBEAT_TIMEOUT
+
+def get_ownership_score(worker_id: str, item_url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{worker_id}|{item_url}".encode(), digest_size=8).digest(), "big")
+
+# Splits subscribed items between every process checking stock using rendezvous hashing on the item url, so each item
+# is checked by exactly one live worker and only the items of a worker that joins or dies move to another worker.
+# Workers register themselves with a heartbeat in the workers table, and schedulers are resynced whenever the live
+# workers change so items are picked up by their new owner.
+class WorkerMembership:
+    def __init__(self, worker_id: str = WORKER_ID):
+        self.worker_id = worker_id
+        self.live_worker_ids: List[str] = [worker_id]
+
+    # the first heartbeat runs before returning so the first sync already splits items with the other live workers,
+    # instead of a restarted worker checking every overdue item at once
+    def start(self):
+        conn = sql_item_persistence.sqlite_item_persistence.get_connection()
+        try:
+            self.heartbeat(conn)
+        finally:
+            conn.close()
+        threading.Thread(target=self.run_heartbeat_loop, daemon=True, name="worker-heartbeat").start()
+
+    def run_heartbeat_loop(self):
+        conn = sql_item_persistence.sqlite_item_persistence.get_connection()
+        try:
+            while True:
+                try:
+                    self.heartbeat(conn)
+                except Exception as e:
+                    logging.error(traceback.format_exc())
+                    logging.error(e)
+                time.sleep(WORKER_HEARTBEAT_INTERVAL)
+        finally:
+            conn.close()
+
+    def heartbeat(self, conn):
+        persistence = sql_item_persistence.sqlite_item_persistence
+        now = datetime.now(tz=timezone.utc)
+        persistence.upsert_worker_heartbeat(conn, self.worker_id, int(now.timestamp()))
+        since_heartbeat_time = int((now - timedelta(seconds=WORKER_HEARTBEAT_TIMEOUT)).timestamp())
+        live_worker_ids = sorted(set(persistence.get_live_worker_ids(conn, since_heartbeat_time)) | {self.worker_id})
+        if live_worker_ids != self.live_worker_ids:
+            logging.info(f"Live stock check workers changed from {self.live_worker_ids} to {live_worker_ids}")
+            self.live_worker_ids = live_worker_ids
+            notify_subscriptions_changed()
+
+    def leave(self, conn):
+        sql_item_persistence.sqlite_item_persistence.delete_worker(conn, self.worker_id)
+
+    def get_live_worker_count(self) -> int:
+        return len(self.live_worker_ids)
+
+    def is_owned(self, item_url: str) -> bool:
+        live_worker_ids = self.live_worker_ids
+        return max(live_worker_ids, key=lambda worker_id: get_ownership_score(worker_id, item_url)) == self.worker_id
+
+    def filter_owned(self, items: List[Item]) -> List[Item]:
+        return [item for item in items if self.is_owned(item.url)]
\ No newline at end of file
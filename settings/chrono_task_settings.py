@@ -7,4 +7,5 @@ load_dotenv()
 
 # time (in minutes) of frequency of chrono tasks
 LOG_REPLACEMENT_FREQUENCY = hours_to_minutes(float(os.getenv("LOG_REPLACEMENT_FREQUENCY", 24)))
-DB_BACKUP_FREQUENCY = hours_to_minutes(float(os.getenv("DB_BACKUP_FREQUENCY", 24)))
\ No newline at end of file
+DB_BACKUP_FREQUENCY = hours_to_minutes(float(os.getenv("DB_BACKUP_FREQUENCY", 24)))
+PRICE_HISTORY_COMPACTION_FREQUENCY = hours_to_minutes(float(os.getenv("PRICE_HISTORY_COMPACTION_FREQUENCY", 1)))
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 import json
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,15 +10,126 @@ BROADCAST_CHANNEL = os.getenv("BROADCAST_CHANNEL")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 
+# hex encoded 256 bit key used instead of DB_PASSWORD so the key is not derived on every new connection,
+# the database must have been created or rekeyed with the same raw key
+DB_RAW_KEY = os.getenv("DB_RAW_KEY")
+# number of key derivation iterations for DB_PASSWORD, must match the value the database was created with
+DB_KDF_ITER = os.getenv("DB_KDF_ITER")
+# time (in milliseconds) a write waits for another process's write to finish before failing
+DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", 5000))
+# stock check results and subscriber states are written in batches, flushed at the end of each stock check cycle,
+# every flush interval (in seconds) or once the max pending writes are waiting, whichever comes first
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 1))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 1000))
+# number of failed flushes in a row before the buffered writes are dropped
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", 5))
+# raw price histories are kept for the raw retention (in seconds), older ones are summarized into hourly and daily rollups.
+# Hourly rollups are kept for the hourly retention (in seconds) and daily rollups forever
+PRICE_HISTORY_RAW_RETENTION = int(os.getenv("PRICE_HISTORY_RAW_RETENTION", 30 * 24 * 60 * 60))
+PRICE_HISTORY_HOURLY_RETENTION = int(os.getenv("PRICE_HISTORY_HOURLY_RETENTION", 180 * 24 * 60 * 60))
+# number of items whose price histories are summarized per transaction
+PRICE_HISTORY_COMPACTION_BATCH_SIZE = int(os.getenv("PRICE_HISTORY_COMPACTION_BATCH_SIZE", 50))
+# max number of idle database connections kept open to be reused
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+
 # time in between stock checks (in seconds) for items
 SELENIUM_TIME_THRESHOLD = int(os.getenv("SELENIUM_TIME_THRESHOLD"))
 REQUESTS_TIME_THRESHOLD = int(os.getenv("REQUESTS_TIME_THRESHOLD"))
 
+# max number of open connections to a single host and time (in seconds) to keep idle connections alive for request stock checks
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("MAX_CONNECTIONS_PER_HOST", 10))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", 60))
+
+# default max number of in flight requests and requests per second to a single website for request stock checks,
+# in flight requests are limited per process while the requests per second are shared by every live stock check worker
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 10))
+REQUESTS_PER_SECOND = float(os.getenv("REQUESTS_PER_SECOND", 5))
+
+# default time (in seconds) before a request to a website times out
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 100))
+
+# max number of urls to remember the last response validators and parsed result for, to skip unchanged pages
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 10000))
+
+# time (in seconds) that the result of a fetch is shared with later callers for the same url
+SINGLE_FLIGHT_TTL = float(os.getenv("SINGLE_FLIGHT_TTL", 10))
+
+# size (in bytes) of chunks read from pages of websites with streaming reads enabled, and how many bytes past the
+# last required marker are read before the rest of the page is skipped
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 16 * 1024))
+STREAM_TAIL_BYTES = int(os.getenv("STREAM_TAIL_BYTES", 8 * 1024))
+
+# number of worker processes used to parse fetched pages
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+
+# max number of completed stock checks waiting to be reported before further checks wait for room
+RESULTS_QUEUE_SIZE = int(os.getenv("RESULTS_QUEUE_SIZE", 100))
+
+# time (in seconds) between logging how long requests to each website were queued by the request limits
+REQUEST_METRICS_LOG_INTERVAL = int(os.getenv("REQUEST_METRICS_LOG_INTERVAL", 300))
+
+# adapts the time between stock checks of each item to how often its price history changed within the window (in seconds),
+# items are checked no more often than the website's time threshold times the min factor and no less often than times the max factor
+ADAPTIVE_INTERVALS_ENABLED = os.getenv("ADAPTIVE_INTERVALS_ENABLED", "True") == "True"
+ADAPTIVE_INTERVAL_WINDOW = int(os.getenv("ADAPTIVE_INTERVAL_WINDOW", 14 * 24 * 60 * 60))
+ADAPTIVE_MIN_INTERVAL_FACTOR = float(os.getenv("ADAPTIVE_MIN_INTERVAL_FACTOR", 0.25))
+ADAPTIVE_MAX_INTERVAL_FACTOR = float(os.getenv("ADAPTIVE_MAX_INTERVAL_FACTOR", 8))
+# number of changes every item is assumed to have, keeps new items from being treated as never changing
+ADAPTIVE_PRIOR_CHANGES = float(os.getenv("ADAPTIVE_PRIOR_CHANGES", 1))
+
+# time (in seconds) between full reloads of subscribed items by the stock check scheduler, subscription changes are
+# picked up sooner by polling the subscription version every SUBSCRIPTION_VERSION_POLL_INTERVAL seconds
+SCHEDULER_RESYNC_INTERVAL = int(os.getenv("SCHEDULER_RESYNC_INTERVAL", 300))
+SUBSCRIPTION_VERSION_POLL_INTERVAL = int(os.getenv("SUBSCRIPTION_VERSION_POLL_INTERVAL", 5))
+
 # time (in seconds) between creating new selenium browser
 SELENIUM_CREATE_NEW_BROWSER_INTERVAL = int(os.getenv("SELENIUM_CREATE_NEW_BROWSER_INTERVAL"))
 
+# time (in seconds) before SELENIUM_CREATE_NEW_BROWSER_INTERVAL is reached that the replacement browser is started in the background
+SELENIUM_STANDBY_LEAD_TIME = int(os.getenv("SELENIUM_STANDBY_LEAD_TIME", 60))
+
+# exponential backoff (in seconds) between attempts to start a selenium browser that failed to start
+SELENIUM_DRIVER_RETRY_BASE_DELAY = float(os.getenv("SELENIUM_DRIVER_RETRY_BASE_DELAY", 5))
+SELENIUM_DRIVER_RETRY_MAX_DELAY = float(os.getenv("SELENIUM_DRIVER_RETRY_MAX_DELAY", 300))
+
+# number of webdrivers checking selenium websites in parallel
+SELENIUM_WORKERS = int(os.getenv("SELENIUM_WORKERS", 2))
+
+# default time (in seconds) between selenium requests to the same website
+SELENIUM_POLITENESS_DELAY = float(os.getenv("SELENIUM_POLITENESS_DELAY", 5))
+
+# "normal" waits for the full page load, "eager" only for the DOM to be ready and "none" returns as soon as navigation starts,
+# checkers then wait for the elements they need for up to SELENIUM_ELEMENT_WAIT_TIMEOUT seconds
+SELENIUM_PAGE_LOAD_STRATEGY = os.getenv("SELENIUM_PAGE_LOAD_STRATEGY", "eager")
+SELENIUM_ELEMENT_WAIT_TIMEOUT = int(os.getenv("SELENIUM_ELEMENT_WAIT_TIMEOUT", 15))
+
+# whether selenium browsers skip downloading images, fonts, stylesheets and SELENIUM_BLOCKED_URL_PATTERNS
+SELENIUM_BLOCK_RESOURCES = os.getenv("SELENIUM_BLOCK_RESOURCES", "True") == "True"
+
 # time (in seconds) between stock checks for items when the previous check has failed
 OFFSET_BETWEEN_FAILS = int(os.getenv("OFFSET_BETWEEN_FAILS"))
+
+# number of failed stock checks in a row across the items of a website before all checks of the website are paused,
+# the pause starts at CIRCUIT_BREAKER_BASE_BACKOFF seconds and doubles every time a single trial check fails, up to CIRCUIT_BREAKER_MAX_BACKOFF
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5))
+CIRCUIT_BREAKER_BASE_BACKOFF = int(os.getenv("CIRCUIT_BREAKER_BASE_BACKOFF", 60))
+CIRCUIT_BREAKER_MAX_BACKOFF = int(os.getenv("CIRCUIT_BREAKER_MAX_BACKOFF", 3600))
+
+# processes checking stock split the subscribed items between each other, each process needs a unique id and
+# processes that have not sent a heartbeat within the timeout (in seconds) are considered dead and their items are taken over
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+WORKER_HEARTBEAT_INTERVAL = int(os.getenv("WORKER_HEARTBEAT_INTERVAL", 15))
+WORKER_HEARTBEAT_TIMEOUT = int(os.getenv("WORKER_HEARTBEAT_TIMEOUT", 60))
+
+# whether the bot runs a checker worker as its child process alongside any other checker workers, or only notifies
+# subscribers of their results. The child is restarted CHECKER_WORKER_RESTART_DELAY seconds after it exits
+RUN_STOCK_CHECKS_IN_BOT = os.getenv("RUN_STOCK_CHECKS_IN_BOT", "True") == "True"
+CHECKER_WORKER_RESTART_DELAY = int(os.getenv("CHECKER_WORKER_RESTART_DELAY", 10))
+
+# time (in seconds) between polls of the stock check events queue when it is empty, and max number of events notified at a time
+NOTIFIER_POLL_INTERVAL = float(os.getenv("NOTIFIER_POLL_INTERVAL", 1))
+NOTIFIER_BATCH_SIZE = int(os.getenv("NOTIFIER_BATCH_SIZE", 100))
+
 ADMINISTRATOR_ID = int(os.getenv("ADMINISTRATOR_ID"))
 IS_LOCAL = os.getenv("IS_LOCAL", "True") == "True"
 
@@ -29,6 +141,51 @@ try:
 except:
     print("No time threshold overrides given for any websites")
 
+# dicts representing override of MAX_CONCURRENT_REQUESTS and REQUESTS_PER_SECOND for a website
+# if empty for a given website, the default will be used
+MAX_CONCURRENT_REQUESTS_OVERRIDE_DICT = {}
+try:
+    MAX_CONCURRENT_REQUESTS_OVERRIDE_DICT = json.loads(os.getenv("MAX_CONCURRENT_REQUESTS_OVERRIDE_DICT"))
+except:
+    print("No max concurrent request overrides given for any websites")
+
+REQUESTS_PER_SECOND_OVERRIDE_DICT = {}
+try:
+    REQUESTS_PER_SECOND_OVERRIDE_DICT = json.loads(os.getenv("REQUESTS_PER_SECOND_OVERRIDE_DICT"))
+except:
+    print("No requests per second overrides given for any websites")
+
+# dict representing override of REQUEST_TIMEOUT for a website
+# if empty for a given website, the default will be used
+REQUEST_TIMEOUT_OVERRIDE_DICT = {}
+try:
+    REQUEST_TIMEOUT_OVERRIDE_DICT = json.loads(os.getenv("REQUEST_TIMEOUT_OVERRIDE_DICT"))
+except:
+    print("No request timeout overrides given for any websites")
+
+# list of websites whose pages are read in chunks and closed early once the markers declared by their checker are found
+STREAMING_READ_WEBSITES = []
+try:
+    STREAMING_READ_WEBSITES = json.loads(os.getenv("STREAMING_READ_WEBSITES"))
+except:
+    print("No websites with streaming reads enabled")
+
+# dict representing override of SELENIUM_POLITENESS_DELAY for a website
+# if empty for a given website, the default will be used
+SELENIUM_POLITENESS_DELAY_OVERRIDE_DICT = {}
+try:
+    SELENIUM_POLITENESS_DELAY_OVERRIDE_DICT = json.loads(os.getenv("SELENIUM_POLITENESS_DELAY_OVERRIDE_DICT"))
+except:
+    print("No selenium politeness delay overrides given for any websites")
+
+# url patterns (* is a wildcard) that selenium browsers do not request when SELENIUM_BLOCK_RESOURCES is on
+SELENIUM_BLOCKED_URL_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.css",
+                                 "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.mp4", "*.webm"]
+try:
+    SELENIUM_BLOCKED_URL_PATTERNS = json.loads(os.getenv("SELENIUM_BLOCKED_URL_PATTERNS"))
+except:
+    print("No selenium blocked url patterns given, using the default patterns")
+
 ADDITIONAL_USERS_TO_PING = []
 try:
     ADDITIONAL_USERS_TO_PING = json.loads(os.getenv("ADDITIONAL_USERS_TO_PING"))
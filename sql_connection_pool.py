@@ -0,0 +1,51 @@
+import logging
+from threading import Lock
+from typing import Callable, List
+
+# Proxy for a pooled connection, closing it hands the connection back to its pool instead of closing it
+class PooledConnection:
+    def __init__(self, pool, connection):
+        self.pool = pool
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def close(self):
+        if self.connection is not None:
+            connection = self.connection
+            self.connection = None
+            self.pool.release(connection)
+
+# Keeps up to max_idle_connections open connections to hand out again, so the cost of opening a connection and
+# deriving the database key is only paid when every pooled connection is in use. Connections are opened outside of
+# the lock, and connections handed back while the pool is full are closed.
+class ConnectionPool:
+    def __init__(self, connect: Callable, max_idle_connections: int):
+        self.connect = connect
+        self.max_idle_connections = max_idle_connections
+        self.lock = Lock()
+        self.idle_connections: List = []
+
+    def get_connection(self) -> PooledConnection:
+        connection = None
+        with self.lock:
+            if self.idle_connections:
+                connection = self.idle_connections.pop()
+        if connection is None:
+            connection = self.connect()
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        try:
+            # uncommitted changes are not carried over to the next user of the connection
+            connection.rollback()
+        except Exception as e:
+            logging.error(e)
+            connection.close()
+            return
+        with self.lock:
+            if len(self.idle_connections) < self.max_idle_connections:
+                self.idle_connections.append(connection)
+                return
+        connection.close()
\ No newline at end of file
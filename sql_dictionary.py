@@ -0,0 +1,46 @@
+from threading import Lock
+from typing import List, Callable, Dict
+
+def to_bitset(ids: List[int]) -> bytes:
+    bitset = bytearray((max(ids, default=0) + 7) // 8)
+    for id in ids:
+        bitset[(id - 1) // 8] |= 1 << ((id - 1) % 8)
+    return bytes(bitset)
+
+def from_bitset(bitset) -> List[int]:
+    return [byte_index * 8 + bit + 1 for byte_index, byte in enumerate(bytes(bitset)) for bit in range(8) if byte & (1 << bit)]
+
+# Maps values such as sizes or stores to the ids of a dictionary table, so a set of them is stored as a bitset with
+# one bit per id instead of as text. Ids never change once assigned, so they are cached in memory and the table is only
+# read again when a value or id is not cached yet. Sets come back in id order, which is the order values were first seen.
+class SqlDictionary:
+    def __init__(self, table: str, column: str):
+        self.table = table
+        self.column = column
+        self.lock = Lock()
+        self.value_to_id: Dict[str, int] = {}
+        self.id_to_value: Dict[int, str] = {}
+
+    def load(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, {self.column} from {self.table}")
+        data = cursor.fetchall()
+        with self.lock:
+            for id, value in data:
+                self.value_to_id[value] = id
+                self.id_to_value[id] = value
+
+    # write is used to add values that are not in the dictionary yet, it must commit right away
+    def encode(self, conn, values: List[str], write: Callable) -> bytes:
+        missing_values = [value for value in dict.fromkeys(values) if value not in self.value_to_id]
+        if missing_values:
+            for value in missing_values:
+                write(conn, f"INSERT OR IGNORE INTO {self.table} ({self.column}) VALUES (?)", (value,))
+            self.load(conn)
+        return to_bitset([self.value_to_id[value] for value in values])
+
+    def decode(self, conn, bitset) -> List[str]:
+        ids = from_bitset(bitset)
+        if any(id not in self.id_to_value for id in ids):
+            self.load(conn)
+        return [self.id_to_value[id] for id in ids]
\ No newline at end of file
@@ -1,5 +1,10 @@
+import atexit
 import json
 import logging
+import os
+import sys
+import threading
+import time
 import traceback
 
 from pysqlcipher3 import dbapi2 as sqlite3
@@ -10,229 +15,405 @@ from datetime import datetime, timezone
 from model.item import Item
 from model.notification_user import NotificationUser
 from model.price_history import PriceHistory
+from model.price_history_rollup import PriceHistoryRollup, add_to_rollups, get_period_start, HOUR, DAY
+from model.stock_check_event import StockCheckEvent
 from model.stock_options import StockOptions
 from model.website import Website
-from settings.settings import DB_PASSWORD, DB_NAME
+from settings.settings import DB_PASSWORD, DB_NAME, DB_RAW_KEY, DB_KDF_ITER, DB_POOL_SIZE, DB_BUSY_TIMEOUT, \
+    WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_PENDING
+from sql_connection_pool import ConnectionPool
+from sql_dictionary import SqlDictionary
+from sql_migrations import migrate
+from sql_write_behind_buffer import WriteBehindBuffer
 from stock_checkers.stock_check_result import StockCheckResult
+from stock_checkers.stock_price import StockPrice
 
-sql_create_items_table = """ CREATE TABLE IF NOT EXISTS items (
-    item_url text PRIMARY KEY,
-    website text NOT NULL,
-    stock_status integer NOT NULL,
-    last_stock_check integer NOT NULL,
-    item_name text NOT NULL,
-    last_stock_check_result text 
-);
-"""
-
-sql_create_users_table = """ CREATE TABLE IF NOT EXISTS users (
-    id integer NOT NULL,
-    stock_options text NOT NULL,
-    last_stock_status integer NOT NULL,
-    item_url text NOT NULL,
-    item_name text,
-    last_in_stock_sizes text NOT NULL,
-    last_in_stock_stores text NOT NULL,
-    PRIMARY KEY(id, item_url) 
-    FOREIGN KEY(item_url) REFERENCES items(item_url)
-);
-"""
-
-sql_create_price_history_table = """ CREATE TABLE IF NOT EXISTS price_history (
-    item_url text NOT NULL,
-    stock_check_time int NOT NULL,
-    stock_check_result text NOT NULL,
-    PRIMARY KEY(item_url, stock_check_time),
-    FOREIGN KEY(item_url) REFERENCES items(item_url)
-);
-"""
-lock = Lock()
+# writes from this process go through SqliteItemPersistence.write one at a time, reads run concurrently on their own connections
+write_lock = Lock()
 
 class SqliteItemPersistence:
     def __init__(self):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute(sql_create_items_table)
-        c.execute(sql_create_users_table)
-        c.execute(sql_create_price_history_table)
-        conn.commit()
-        conn.close()
+        self.connection_pool = ConnectionPool(SqliteItemPersistence.connect, DB_POOL_SIZE)
+        self.write_behind_buffer = WriteBehindBuffer()
+        self.size_dictionary = SqlDictionary("sizes", "size")
+        self.store_dictionary = SqlDictionary("stores", "store")
+        conn = SqliteItemPersistence.connect()
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        threading.Thread(target=self.run_write_behind_flusher, daemon=True, name="write-behind-flusher").start()
+        atexit.register(self.flush_on_exit)
 
     def get_item(self, conn, item_url: str) -> Optional[Item]:
-        lock.acquire()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * from items WHERE item_url = ?", (item_url,))
+        data = cursor.fetchone()
+        if data is None:
+            return None
+        else:
+            return SqliteItemPersistence.to_item(data)
+
+    def get_subscribed_items(self, conn, websites: List[str]) -> List[Item]:
+        cursor = conn.cursor()
+        if websites:
+            websites_param = SqliteItemPersistence.get_prepared_str(websites)
+            query = f"SELECT * from items WHERE website IN ({websites_param}) AND EXISTS (SELECT 1 FROM users WHERE items.item_url = item_url)"
+            cursor.execute(query, websites)
+            data = cursor.fetchall()
+            return list(map(SqliteItemPersistence.to_item, data))
+        else:
+            return []
+
+    # write behind writes are buffered and committed together by the next flush, other writes are committed right away
+    # after flushing the buffer so writes from this process always reach the database in the order they were made
+    def write(self, conn, query: str, values=(), is_write_behind=False):
+        if is_write_behind:
+            if self.write_behind_buffer.add(query, values) >= WRITE_BEHIND_MAX_PENDING:
+                self.flush(conn)
+            return
+        write_lock.acquire()
         try:
+            self.flush_while_locked(conn)
             cursor = conn.cursor()
-            cursor.execute("SELECT * from items WHERE item_url = ?", (item_url,))
-            data = cursor.fetchone()
-            if data is None:
-                return None
-            else:
-                return SqliteItemPersistence.to_item(data)
+            cursor.execute(query, values)
+            conn.commit()
+        except Exception:
+            # a failed write would otherwise keep the database locked for every other writer
+            conn.rollback()
+            raise
         finally:
-            lock.release()
+            write_lock.release()
 
-    def get_items(self, conn, stock_check_threshold: int, websites: List[str]):
-        lock.acquire()
+    def flush(self, conn):
+        write_lock.acquire()
         try:
-            cursor = conn.cursor()
-            if websites:
-                websites_param = SqliteItemPersistence.get_prepared_str(websites)
-                query = f"SELECT * from items WHERE last_stock_check <= ? AND website IN ({websites_param}) AND EXISTS (SELECT 1 FROM users WHERE items.item_url = item_url)"
-                cursor.execute(query, (stock_check_threshold, *websites))
-                data = cursor.fetchall()
-                return list(map(SqliteItemPersistence.to_item, data))
-            else:
-                return []
+            self.flush_while_locked(conn)
+        finally:
+            write_lock.release()
+
+    # commits every buffered write in a single transaction, a failed flush is rolled back and its writes are kept
+    # in the buffer to be retried by the next flush until they have failed WRITE_BEHIND_MAX_ATTEMPTS times
+    def flush_while_locked(self, conn):
+        writes = self.write_behind_buffer.take_all()
+        if not writes:
+            return
+        try:
+            WriteBehindBuffer.execute_all(conn, writes)
+            conn.commit()
+            self.write_behind_buffer.mark_flushed()
+        except Exception as e:
+            conn.rollback()
+            logging.error(traceback.format_exc())
+            logging.error(e)
+            if not self.write_behind_buffer.restore_failed(writes):
+                self.flush_one_at_a_time(conn, writes)
+
+    def flush_one_at_a_time(self, conn, writes):
+        logging.error(f"Committing {len(writes)} buffered writes one at a time after repeated failed flushes")
+        cursor = conn.cursor()
+        for query, values in writes:
+            try:
+                cursor.execute(query, values)
+            except Exception as e:
+                logging.error(f"Dropping buffered write {query} {values}: {e}")
+        conn.commit()
+
+    def run_write_behind_flusher(self):
+        conn = self.get_connection()
+        while True:
+            time.sleep(WRITE_BEHIND_FLUSH_INTERVAL)
+            try:
+                self.flush(conn)
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                logging.error(e)
+
+    def flush_on_exit(self):
+        conn = self.get_connection()
+        try:
+            self.flush(conn)
         finally:
-            lock.release()
+            conn.close()
 
     @staticmethod
     def get_prepared_str(elements):
         return ",".join("?"*len(elements))
 
     def delete_notification_user(self, conn, id, item_url):
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE from users WHERE users.id = ? and users.item_url = ?", (id, item_url))
-            conn.commit()
-        finally:
-            lock.release()
+        self.write(conn, "DELETE from users WHERE users.id = ? and users.item_url = ?", (id, item_url))
 
     def delete_all_notification_users_with_id(self, conn, id: int):
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE from users WHERE users.id = ?", (id,))
-            conn.commit()
-        finally:
-            lock.release()
+        self.write(conn, "DELETE from users WHERE users.id = ?", (id,))
 
     def get_all_subscribed_for_user(self, conn, id) -> List[NotificationUser]:
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * from users WHERE id = ?", (id,))
-            data = cursor.fetchall()
-            return list(map(SqliteItemPersistence.to_user, data))
-        finally:
-            lock.release()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * from users WHERE id = ?", (id,))
+        data = cursor.fetchall()
+        return list(map(SqliteItemPersistence.to_user, data))
 
+    def get_subscription_version(self, conn) -> int:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version from subscription_version")
+        return cursor.fetchone()[0]
+
+    # only the price histories since the given time are read, the planner would otherwise scan the whole primary key
+    # to group by item without sorting
+    def get_price_history_change_counts(self, conn, since_stock_check_time: int) -> Dict[str, int]:
+        cursor = conn.cursor()
+        cursor.execute("SELECT item_url, COUNT(*) from price_history INDEXED BY price_history_stock_check_time WHERE stock_check_time >= ? GROUP BY item_url",
+                       (since_stock_check_time,))
+        return dict(cursor.fetchall())
+
+    # each url is a range scan of the primary key read backwards that stops after max_to_retrieve rows, so only the rows
+    # returned are read and decoded no matter how long the item has been tracked. Rollups fill in for the raw price
+    # histories that were already pruned
     def get_latest_price_histories(self, conn, item_urls: List[str], max_to_retrieve: int) -> Dict[str, List[PriceHistory]]:
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            item_urls_statement = SqliteItemPersistence.get_prepared_str(item_urls)
-            cursor.execute(f"SELECT * from price_history WHERE item_url IN ({item_urls_statement}) ORDER BY stock_check_time DESC", item_urls)
-            data = cursor.fetchall()
-            all_price_histories = map(SqliteItemPersistence.to_price_history, data)
-
-            url_to_price_dict = {}
-            for price_history in all_price_histories:
-                item_url = price_history.stock_check_result.item_url
-                if item_url in url_to_price_dict:
-                    top_price_histories = url_to_price_dict[item_url]
-                    if len(top_price_histories) < max_to_retrieve:
-                        top_price_histories.append(price_history)
-                else:
-                    url_to_price_dict[item_url] = [price_history]
-
-            return url_to_price_dict
-        finally:
-            lock.release()
+        cursor = conn.cursor()
+        url_to_price_dict = {}
+        for item_url in dict.fromkeys(item_urls):
+            cursor.execute("SELECT * from price_history WHERE item_url = ? ORDER BY stock_check_time DESC LIMIT ?", (item_url, max_to_retrieve))
+            price_histories = [self.to_price_history(conn, data) for data in cursor.fetchall()]
+            if len(price_histories) < max_to_retrieve:
+                price_histories.extend(rollup.to_price_history() for rollup in self.get_price_history_rollups(conn, item_url, max_to_retrieve - len(price_histories)))
+            if price_histories:
+                url_to_price_dict[item_url] = price_histories
 
-    def upsert_item(self, conn, item: Item):
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            last_stock_check_result = None if item.last_stock_check_result is None else item.last_stock_check_result.to_json()
-            values_to_insert = (item.url, item.website.value, int(item.stock_status), int(item.last_stock_check.timestamp()), item.item_name, last_stock_check_result)
-            cursor.execute("REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)", values_to_insert)
-            conn.commit()
-        finally:
-            lock.release()
+        return url_to_price_dict
+
+    # latest rollups first, hourly rollups while they are kept and then daily rollups of the days before them.
+    # Hourly rollups are pruned whole days at a time, so the two never cover the same time
+    def get_price_history_rollups(self, conn, item_url: str, max_to_retrieve: int) -> List[PriceHistoryRollup]:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * from price_history_rollups WHERE item_url = ? AND period = ? ORDER BY period_start DESC LIMIT ?", (item_url, HOUR, max_to_retrieve))
+        rollups = list(map(SqliteItemPersistence.to_price_history_rollup, cursor.fetchall()))
+        if len(rollups) < max_to_retrieve:
+            before_time = get_period_start(DAY, rollups[-1].period_start) if rollups else sys.maxsize
+            cursor.execute("SELECT * from price_history_rollups WHERE item_url = ? AND period = ? AND period_start < ? ORDER BY period_start DESC LIMIT ?",
+                           (item_url, DAY, before_time, max_to_retrieve - len(rollups)))
+            rollups.extend(map(SqliteItemPersistence.to_price_history_rollup, cursor.fetchall()))
+        return rollups
 
-    def insert_price_history(self, conn, stock_check_result: StockCheckResult, stock_check_time: int):
-        lock.acquire()
+    # Summarizes the raw price histories from before raw_cutoff_time of up to max_items items after after_item_url into
+    # their hourly and daily rollups and deletes them, in one short transaction so writers are never held back for long.
+    # The last raw price history before the cutoff is kept, the time until the next change is still needed to summarize it.
+    # Returns the last item compacted to continue after, or None once there is nothing left to compact
+    def compact_price_histories(self, conn, after_item_url: str, raw_cutoff_time: int, max_items: int) -> Optional[str]:
+        cursor = conn.cursor()
+        cursor.execute("SELECT item_url from price_history WHERE item_url > ? AND stock_check_time < ? GROUP BY item_url HAVING COUNT(*) > 1 ORDER BY item_url LIMIT ?",
+                       (after_item_url, raw_cutoff_time, max_items))
+        item_urls = [data[0] for data in cursor.fetchall()]
+        if not item_urls:
+            return None
+        write_lock.acquire()
         try:
-            cursor = conn.cursor()
-            values_to_insert = (stock_check_result.item_url, stock_check_time, stock_check_result.to_json())
-            cursor.execute("INSERT OR IGNORE INTO price_history VALUES (?, ?, ?)", values_to_insert)
+            self.flush_while_locked(conn)
+            for item_url in item_urls:
+                self.compact_item_price_histories(conn, item_url, raw_cutoff_time)
             conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
-            lock.release()
+            write_lock.release()
+        return item_urls[-1]
+
+    def compact_item_price_histories(self, conn, item_url: str, raw_cutoff_time: int):
+        cursor = conn.cursor()
+        cursor.execute("SELECT * from price_history WHERE item_url = ? AND stock_check_time < ? ORDER BY stock_check_time", (item_url, raw_cutoff_time))
+        price_histories = [self.to_price_history(conn, data) for data in cursor.fetchall()]
+        rollups = {}
+        for price_history, next_price_history in zip(price_histories, price_histories[1:]):
+            add_to_rollups(rollups, price_history.stock_check_result, int(price_history.stock_check_time.timestamp()), int(next_price_history.stock_check_time.timestamp()))
+        for (period, period_start), rollup in rollups.items():
+            cursor.execute("SELECT * from price_history_rollups WHERE item_url = ? AND period = ? AND period_start = ?", (item_url, period, period_start))
+            data = cursor.fetchone()
+            if data is not None:
+                existing_rollup = SqliteItemPersistence.to_price_history_rollup(data)
+                existing_rollup.merge(rollup)
+                rollup = existing_rollup
+            cursor.execute("REPLACE INTO price_history_rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (item_url,
+                            period,
+                            period_start,
+                            rollup.item_name,
+                            rollup.stock_price.min_price,
+                            rollup.stock_price.min_price_str,
+                            rollup.stock_price.min_official_price,
+                            rollup.stock_price.min_official_price_str,
+                            rollup.in_stock_seconds,
+                            rollup.change_count))
+        cursor.execute("DELETE from price_history WHERE item_url = ? AND stock_check_time < ?", (item_url, int(price_histories[-1].stock_check_time.timestamp())))
+
+    def delete_hourly_price_history_rollups_before(self, conn, cutoff_time: int):
+        self.write(conn, "DELETE from price_history_rollups WHERE period = ? AND period_start < ?", (HOUR, cutoff_time))
+
+    def upsert_item(self, conn, item: Item, is_write_behind=False):
+        last_stock_check_result = None if item.last_stock_check_result is None else item.last_stock_check_result.to_json()
+        values_to_insert = (item.url, item.website.value, int(item.stock_status), int(item.last_stock_check.timestamp()), item.item_name, last_stock_check_result)
+        self.write(conn, "REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)", values_to_insert, is_write_behind)
+
+    def insert_price_history(self, conn, stock_check_result: StockCheckResult, stock_check_time: int, is_write_behind=False):
+        stock_price = stock_check_result.stock_price
+        values_to_insert = (
+            stock_check_result.item_url,
+            stock_check_time,
+            int(stock_check_result.is_item_available),
+            stock_check_result.item_name,
+            int(stock_check_result.is_in_stock),
+            stock_price.min_price,
+            stock_price.min_price_str,
+            stock_price.min_official_price,
+            stock_price.min_official_price_str,
+            self.size_dictionary.encode(conn, stock_check_result.available_sizes, self.write),
+            self.size_dictionary.encode(conn, stock_check_result.in_stock_sizes, self.write),
+            self.store_dictionary.encode(conn, stock_check_result.in_stock_stores, self.write),
+            stock_check_result.fail_count)
+        self.write(conn, "INSERT OR IGNORE INTO price_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values_to_insert, is_write_behind)
 
     def insert_item_if_doesnt_exist(self, conn, item: Item):
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            last_stock_check_result = None if item.last_stock_check_result is None else item.last_stock_check_result.to_json()
-            values_to_insert = (item.url, item.website.value, int(item.stock_status), int(item.last_stock_check.timestamp()), item.item_name, last_stock_check_result)
-            cursor.execute("INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?, ?, ?)", values_to_insert)
-            conn.commit()
-        finally:
-            lock.release()
+        last_stock_check_result = None if item.last_stock_check_result is None else item.last_stock_check_result.to_json()
+        values_to_insert = (item.url, item.website.value, int(item.stock_status), int(item.last_stock_check.timestamp()), item.item_name, last_stock_check_result)
+        self.write(conn, "INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?, ?, ?)", values_to_insert)
 
-    def update_stock_check_time(self, conn, item_url: str, new_stock_check_time: int):
-        lock.acquire()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE item SET last_stock_check = ? WHERE item_url = ?", (new_stock_check_time, item_url))
-            conn.commit()
-        finally:
-            lock.release()
+    def update_stock_check_time(self, conn, item_url: str, new_stock_check_time: int, is_write_behind=False):
+        self.write(conn, "UPDATE items SET last_stock_check = ? WHERE item_url = ?", (new_stock_check_time, item_url), is_write_behind)
 
-    def upsert_notification_user(self, conn, notification_user: NotificationUser):
-        lock.acquire()
+    def upsert_notification_user(self, conn, notification_user: NotificationUser, is_write_behind=False):
         try:
-            cursor = conn.cursor()
-            cursor.execute("REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
-                           (notification_user.id,
-                            json.dumps(notification_user.stock_options.__dict__),
-                            int(notification_user.last_stock_status),
-                            notification_user.item_url,
-                            notification_user.item_name,
-                            json.dumps(list(notification_user.last_in_stock_sizes_for_user)),
-                            json.dumps(list(notification_user.last_in_stock_stores_for_user))))
-            conn.commit()
+            self.write(conn, "REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (notification_user.id,
+                        json.dumps(notification_user.stock_options.__dict__),
+                        int(notification_user.last_stock_status),
+                        notification_user.item_url,
+                        notification_user.item_name,
+                        json.dumps(list(notification_user.last_in_stock_sizes_for_user)),
+                        json.dumps(list(notification_user.last_in_stock_stores_for_user))),
+                       is_write_behind)
         except Exception as e:
             logging.error(traceback.format_exc())
             logging.error(e)
-        finally:
-            lock.release()
 
-    def get_subscribed_users_for_item(self, conn, item: Item):
-        lock.acquire()
+    # only writes what notifying the user changed, so an unsubscribe or new stock options committed since the user was
+    # loaded are kept and a user that unsubscribed is not subscribed again
+    def update_notification_user_state(self, conn, notification_user: NotificationUser, is_write_behind=False):
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * from users WHERE item_url = ?", (item.url,))
-            data = cursor.fetchall()
-            return list(map(SqliteItemPersistence.to_user, data))
-        finally:
-            lock.release()
+            self.write(conn, "UPDATE users SET item_name=?, last_stock_status=?, last_in_stock_sizes=?, last_in_stock_stores=? WHERE id=? AND item_url=?",
+                       (notification_user.item_name,
+                        int(notification_user.last_stock_status),
+                        json.dumps(list(notification_user.last_in_stock_sizes_for_user)),
+                        json.dumps(list(notification_user.last_in_stock_stores_for_user)),
+                        notification_user.id,
+                        notification_user.item_url),
+                       is_write_behind)
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            logging.error(e)
+
+    # subscribers of every item in a single query, grouped by item url
+    def get_subscribed_users_for_items(self, conn, item_urls: List[str]) -> Dict[str, List[NotificationUser]]:
+        cursor = conn.cursor()
+        item_urls_statement = SqliteItemPersistence.get_prepared_str(item_urls)
+        cursor.execute(f"SELECT * from users WHERE item_url IN ({item_urls_statement})", item_urls)
+        subscribed_users_by_item_url = {}
+        for subscribed_user in map(SqliteItemPersistence.to_user, cursor.fetchall()):
+            subscribed_users_by_item_url.setdefault(subscribed_user.item_url, []).append(subscribed_user)
+        return subscribed_users_by_item_url
 
     def get_notification_user(self, conn, id: int, item_url) -> Optional[NotificationUser]:
-        lock.acquire()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * from users WHERE id = ? and item_url = ?", (id, item_url,))
+        data = cursor.fetchone()
+        if data is not None:
+            return SqliteItemPersistence.to_user(data)
+        else:
+            return None
+
+    def enqueue_stock_check_event(self, conn, item: Item, stock_check_result: StockCheckResult, is_write_behind=False):
+        values_to_insert = (item.url, item.website.value, item.item_name, int(item.last_stock_check.timestamp()), stock_check_result.to_json())
+        self.write(conn, "INSERT INTO stock_check_events (item_url, website, item_name, stock_check_time, stock_check_result) VALUES (?, ?, ?, ?, ?)", values_to_insert, is_write_behind)
+
+    def get_stock_check_events(self, conn, max_to_retrieve: int) -> List[StockCheckEvent]:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * from stock_check_events ORDER BY id LIMIT ?", (max_to_retrieve,))
+        data = cursor.fetchall()
+        return list(map(SqliteItemPersistence.to_stock_check_event, data))
+
+    def delete_stock_check_events_through(self, conn, last_id: int):
+        self.write(conn, "DELETE from stock_check_events WHERE id <= ?", (last_id,))
+
+    def upsert_worker_heartbeat(self, conn, worker_id: str, heartbeat_time: int):
+        self.write(conn, "REPLACE INTO workers VALUES (?, ?)", (worker_id, heartbeat_time))
+
+    def get_live_worker_ids(self, conn, since_heartbeat_time: int) -> List[str]:
+        cursor = conn.cursor()
+        cursor.execute("SELECT worker_id from workers WHERE last_heartbeat >= ?", (since_heartbeat_time,))
+        return [data[0] for data in cursor.fetchall()]
+
+    def delete_worker(self, conn, worker_id: str):
+        self.write(conn, "DELETE from workers WHERE worker_id = ?", (worker_id,))
+
+    # connections are taken from the pool, closing them hands them back
+    def get_connection(self):
+        return self.connection_pool.get_connection()
+
+    @staticmethod
+    def connect():
+        conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+        cursor = conn.cursor()
+        SqliteItemPersistence.set_key(cursor)
+        # readers and the writer do not block each other in wal mode, writers from other processes wait for the busy timeout
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT}")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @staticmethod
+    def set_key(cursor):
+        if DB_RAW_KEY:
+            cursor.execute(f"PRAGMA key = \"x'{DB_RAW_KEY}'\"")
+        else:
+            cursor.execute(f"PRAGMA key = '{DB_PASSWORD}'")
+            if DB_KDF_ITER is not None:
+                cursor.execute(f"PRAGMA kdf_iter = {int(DB_KDF_ITER)}")
+
+    # Copies a snapshot of the database read in a single transaction, so the copy is consistent while other processes
+    # keep reading and writing and the wal cannot always be checkpointed. Writes buffered by this process are committed
+    # first so the copy includes them. Uses the online backup api when the driver has it, otherwise sqlcipher_export.
+    def copy_database_file(self, conn, destination: str):
+        if os.path.exists(destination):
+            os.remove(destination)
+        write_lock.acquire()
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * from users WHERE id = ? and item_url = ?", (id, item_url,))
-            data = cursor.fetchone()
-            if data is not None:
-                return SqliteItemPersistence.to_user(data)
-            else:
-                return None
+            self.flush_while_locked(conn)
         finally:
-            lock.release()
+            write_lock.release()
+        if hasattr(conn, "backup"):
+            backup_conn = sqlite3.connect(destination)
+            try:
+                SqliteItemPersistence.set_key(backup_conn.cursor())
+                conn.backup(backup_conn)
+            finally:
+                backup_conn.close()
+        else:
+            SqliteItemPersistence.export_database(conn, destination)
 
-    def get_connection(self):
-        lock.acquire()
+    # the attached database is encrypted with the key of the main database as no other key is given. sqlcipher_export
+    # copies table by table, the explicit transaction makes every table come from the same snapshot
+    @staticmethod
+    def export_database(conn, destination: str):
+        cursor = conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS backup", (destination,))
         try:
-            conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-            cursor = conn.cursor()
-            cursor.execute(f"PRAGMA key = '{DB_PASSWORD}'")
-            return conn
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute("SELECT sqlcipher_export('backup')")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
         finally:
-            lock.release()
+            cursor.execute("DETACH DATABASE backup")
 
     def does_item_exist(self, conn, item_url: str):
         return self.get_item(conn, item_url) is not None
@@ -247,6 +428,18 @@ class SqliteItemPersistence:
             data[4],
             None if data[5] is None else StockCheckResult.from_json(json.loads(data[5])))
 
+    @staticmethod
+    def to_stock_check_event(data) -> StockCheckEvent:
+        stock_check_result = StockCheckResult.from_json(json.loads(data[5]))
+        item = Item(
+            data[1],
+            Website(data[2]),
+            stock_check_result.is_in_stock,
+            datetime.fromtimestamp(data[4], tz=timezone.utc),
+            data[3],
+            stock_check_result)
+        return StockCheckEvent(data[0], item, stock_check_result)
+
     @staticmethod
     def to_user(data) -> NotificationUser:
         last_in_stock_stores = [] if not data[6] else json.loads(data[6])
@@ -260,9 +453,27 @@ class SqliteItemPersistence:
             last_in_stock_stores)
 
     @staticmethod
-    def to_price_history(data) -> PriceHistory:
-        return PriceHistory(
-            StockCheckResult.from_json(json.loads(data[2])),
-            datetime.fromtimestamp(data[1], tz=timezone.utc))
+    def to_price_history_rollup(data) -> PriceHistoryRollup:
+        return PriceHistoryRollup(
+            data[0],
+            data[1],
+            data[2],
+            data[3],
+            StockPrice(data[4], data[5], data[6], data[7]),
+            data[8],
+            data[9])
+
+    def to_price_history(self, conn, data) -> PriceHistory:
+        stock_check_result = StockCheckResult(
+            data[2],
+            data[3],
+            data[0],
+            StockPrice(data[5], data[6], data[7], data[8]),
+            data[4],
+            self.size_dictionary.decode(conn, data[9]),
+            self.size_dictionary.decode(conn, data[10]),
+            self.store_dictionary.decode(conn, data[11]),
+            data[12])
+        return PriceHistory(stock_check_result, datetime.fromtimestamp(data[1], tz=timezone.utc))
 
 sqlite_item_persistence = SqliteItemPersistence()
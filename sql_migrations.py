@@ -0,0 +1,221 @@
+import json
+import logging
+from typing import Dict, List
+
+from sql_dictionary import to_bitset
+
+sql_create_items_table = """ CREATE TABLE IF NOT EXISTS items (
+    item_url text PRIMARY KEY,
+    website text NOT NULL,
+    stock_status integer NOT NULL,
+    last_stock_check integer NOT NULL,
+    item_name text NOT NULL,
+    last_stock_check_result text 
+);
+"""
+
+sql_create_users_table = """ CREATE TABLE IF NOT EXISTS users (
+    id integer NOT NULL,
+    stock_options text NOT NULL,
+    last_stock_status integer NOT NULL,
+    item_url text NOT NULL,
+    item_name text,
+    last_in_stock_sizes text NOT NULL,
+    last_in_stock_stores text NOT NULL,
+    PRIMARY KEY(id, item_url) 
+    FOREIGN KEY(item_url) REFERENCES items(item_url)
+);
+"""
+
+sql_create_price_history_table = """ CREATE TABLE IF NOT EXISTS price_history (
+    item_url text NOT NULL,
+    stock_check_time int NOT NULL,
+    stock_check_result text NOT NULL,
+    PRIMARY KEY(item_url, stock_check_time),
+    FOREIGN KEY(item_url) REFERENCES items(item_url)
+);
+"""
+
+sql_create_sizes_table = """ CREATE TABLE IF NOT EXISTS sizes (
+    id integer PRIMARY KEY,
+    size text NOT NULL UNIQUE
+);
+"""
+
+sql_create_stores_table = """ CREATE TABLE IF NOT EXISTS stores (
+    id integer PRIMARY KEY,
+    store text NOT NULL UNIQUE
+);
+"""
+
+# sizes and stores are bitsets of ids in the sizes and stores tables
+sql_create_normalized_price_history_table = """ CREATE TABLE IF NOT EXISTS price_history_normalized (
+    item_url text NOT NULL,
+    stock_check_time int NOT NULL,
+    is_item_available integer NOT NULL,
+    item_name text,
+    is_in_stock integer NOT NULL,
+    min_price real NOT NULL,
+    min_price_str text NOT NULL,
+    min_official_price real NOT NULL,
+    min_official_price_str text NOT NULL,
+    available_sizes blob NOT NULL,
+    in_stock_sizes blob NOT NULL,
+    in_stock_stores blob NOT NULL,
+    fail_count integer NOT NULL,
+    PRIMARY KEY(item_url, stock_check_time),
+    FOREIGN KEY(item_url) REFERENCES items(item_url)
+);
+"""
+
+# hourly and daily summaries of price histories older than the raw retention
+sql_create_price_history_rollups_table = """ CREATE TABLE IF NOT EXISTS price_history_rollups (
+    item_url text NOT NULL,
+    period text NOT NULL,
+    period_start integer NOT NULL,
+    item_name text,
+    min_price real NOT NULL,
+    min_price_str text NOT NULL,
+    min_official_price real NOT NULL,
+    min_official_price_str text NOT NULL,
+    in_stock_seconds integer NOT NULL,
+    change_count integer NOT NULL,
+    PRIMARY KEY(item_url, period, period_start),
+    FOREIGN KEY(item_url) REFERENCES items(item_url)
+);
+"""
+
+sql_create_workers_table = """ CREATE TABLE IF NOT EXISTS workers (
+    worker_id text PRIMARY KEY,
+    last_heartbeat integer NOT NULL
+);
+"""
+
+sql_create_stock_check_events_table = """ CREATE TABLE IF NOT EXISTS stock_check_events (
+    id integer PRIMARY KEY AUTOINCREMENT,
+    item_url text NOT NULL,
+    website text NOT NULL,
+    item_name text NOT NULL,
+    stock_check_time integer NOT NULL,
+    stock_check_result text NOT NULL
+);
+"""
+
+# bumped in the same transaction as every subscribe and unsubscribe from any process, so the stock check workers
+# can cheaply poll for subscription changes. Updating a subscriber's notification state is not a subscription change
+sql_create_subscription_version_table = """ CREATE TABLE IF NOT EXISTS subscription_version (
+    id integer PRIMARY KEY CHECK (id = 0),
+    version integer NOT NULL
+);
+"""
+
+sql_create_subscription_version_triggers = [
+    f""" CREATE TRIGGER IF NOT EXISTS users_{operation.lower()}_subscription_version AFTER {operation} ON users
+BEGIN
+    UPDATE subscription_version SET version = version + 1;
+END;
+""" for operation in ["INSERT", "DELETE"]]
+
+# indexes for the hot queries, subscribers are looked up by item and items by website
+sql_create_users_item_url_index = "CREATE INDEX IF NOT EXISTS users_item_url ON users(item_url)"
+sql_create_items_website_index = "CREATE INDEX IF NOT EXISTS items_website ON items(website)"
+# recent changes of every item are counted by time, the primary key orders the price histories by item first
+sql_create_price_history_stock_check_time_index = "CREATE INDEX IF NOT EXISTS price_history_stock_check_time ON price_history(stock_check_time, item_url)"
+
+def create_tables(cursor):
+    cursor.execute(sql_create_items_table)
+    cursor.execute(sql_create_users_table)
+    cursor.execute(sql_create_price_history_table)
+    cursor.execute(sql_create_workers_table)
+    cursor.execute(sql_create_stock_check_events_table)
+
+def create_hot_query_indexes(cursor):
+    cursor.execute(sql_create_users_item_url_index)
+    cursor.execute(sql_create_items_website_index)
+
+def get_dictionary_ids(cursor, table: str, column: str, values: List[str], value_to_id: Dict[str, int]) -> List[int]:
+    for value in values:
+        if value not in value_to_id:
+            cursor.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            cursor.execute(f"SELECT id from {table} WHERE {column} = ?", (value,))
+            value_to_id[value] = cursor.fetchone()[0]
+    return [value_to_id[value] for value in values]
+
+# moves the price histories out of json into typed columns, copying them over in batches
+def normalize_price_history(cursor):
+    cursor.execute(sql_create_sizes_table)
+    cursor.execute(sql_create_stores_table)
+    cursor.execute(sql_create_normalized_price_history_table)
+    size_to_id = {}
+    store_to_id = {}
+    insert_cursor = cursor.connection.cursor()
+    cursor.execute("SELECT item_url, stock_check_time, stock_check_result from price_history")
+    while True:
+        data = cursor.fetchmany(1000)
+        if not data:
+            break
+        values_to_insert = []
+        for item_url, stock_check_time, stock_check_result_json in data:
+            stock_check_result = json.loads(stock_check_result_json)
+            stock_price = stock_check_result["stock_price"]
+            available_sizes = stock_check_result.get("available_sizes") or []
+            in_stock_sizes = stock_check_result.get("in_stock_sizes") or []
+            in_stock_stores = stock_check_result.get("in_stock_stores") or []
+            values_to_insert.append((
+                item_url,
+                stock_check_time,
+                int(stock_check_result["is_item_available"]),
+                stock_check_result["item_name"],
+                int(stock_check_result["is_in_stock"]),
+                stock_price["min_price"],
+                stock_price["min_price_str"],
+                stock_price["min_official_price"],
+                stock_price["min_official_price_str"],
+                to_bitset(get_dictionary_ids(insert_cursor, "sizes", "size", available_sizes, size_to_id)),
+                to_bitset(get_dictionary_ids(insert_cursor, "sizes", "size", in_stock_sizes, size_to_id)),
+                to_bitset(get_dictionary_ids(insert_cursor, "stores", "store", in_stock_stores, store_to_id)),
+                stock_check_result.get("fail_count", 0)))
+        insert_cursor.executemany("INSERT OR IGNORE INTO price_history_normalized VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values_to_insert)
+    cursor.execute("DROP TABLE price_history")
+    cursor.execute("ALTER TABLE price_history_normalized RENAME TO price_history")
+    cursor.execute(sql_create_price_history_stock_check_time_index)
+
+def create_price_history_rollups(cursor):
+    cursor.execute(sql_create_price_history_rollups_table)
+
+def create_subscription_version(cursor):
+    cursor.execute(sql_create_subscription_version_table)
+    cursor.execute("INSERT OR IGNORE INTO subscription_version VALUES (0, 0)")
+    for sql_create_subscription_version_trigger in sql_create_subscription_version_triggers:
+        cursor.execute(sql_create_subscription_version_trigger)
+
+# each migration upgrades the schema by one version, new migrations are only ever appended.
+# Databases created before versioning are at version 0 and already have the tables, which create_tables leaves as is
+migrations = [
+    create_tables,
+    create_hot_query_indexes,
+    normalize_price_history,
+    create_price_history_rollups,
+    create_subscription_version,
+]
+
+# Upgrades the database to the latest schema version kept in PRAGMA user_version. Each migration runs in its own
+# transaction along with its version bump, so a failed migration leaves the database at the previous version.
+# The write lock is taken before the version is read, so processes starting together migrate the database only once.
+def migrate(conn):
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    for version, migration in enumerate(migrations, start=1):
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] >= version:
+                cursor.execute("ROLLBACK")
+                continue
+            logging.info(f"Migrating database to version {version}")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
\ No newline at end of file
@@ -0,0 +1,49 @@
+from itertools import groupby
+from threading import Lock
+from typing import List, Tuple
+
+from settings.settings import WRITE_BEHIND_MAX_ATTEMPTS
+
+# Collects writes that are committed later in a single transaction, in the order they were made.
+# Writes are only durable once flushed, so writes made within the last flush interval are lost if the process dies.
+# A flush that fails is retried with the next flush along with any newer writes, and after WRITE_BEHIND_MAX_ATTEMPTS
+# failed flushes in a row its writes are committed one at a time, dropping the ones that fail, so a single bad write
+# cannot hold back every later write.
+class WriteBehindBuffer:
+    def __init__(self):
+        self.lock = Lock()
+        self.pending_writes: List[Tuple[str, tuple]] = []
+        self.failed_attempts = 0
+
+    # returns the number of writes waiting to be flushed
+    def add(self, query: str, values: tuple) -> int:
+        with self.lock:
+            self.pending_writes.append((query, values))
+            return len(self.pending_writes)
+
+    def take_all(self) -> List[Tuple[str, tuple]]:
+        with self.lock:
+            writes = self.pending_writes
+            self.pending_writes = []
+            return writes
+
+    def mark_flushed(self):
+        with self.lock:
+            self.failed_attempts = 0
+
+    # returns False once the writes have failed too many times to be retried together
+    def restore_failed(self, writes: List[Tuple[str, tuple]]) -> bool:
+        with self.lock:
+            self.failed_attempts += 1
+            if self.failed_attempts >= WRITE_BEHIND_MAX_ATTEMPTS:
+                self.failed_attempts = 0
+                return False
+            self.pending_writes = writes + self.pending_writes
+            return True
+
+    # runs of the same query are executed together with executemany
+    @staticmethod
+    def execute_all(conn, writes: List[Tuple[str, tuple]]):
+        cursor = conn.cursor()
+        for query, query_writes in groupby(writes, key=lambda write: write[0]):
+            cursor.executemany(query, [values for _, values in query_writes])
\ No newline at end of file
@@ -2,7 +2,7 @@ import asyncio
 import logging
 import math
 import traceback
-from typing import List, Set
+from typing import List, Set, Optional
 from datetime import datetime
 
 import tldextract
@@ -17,7 +17,9 @@ from model.website import Website, bannable_websites
 from settings.settings import ADMINISTRATOR_ID
 from stock_checkers.stock_check_result import StockCheckResult, MAX_FAILURES, NO_IN_STOCK_SIZES
 
-def handle_stock_check_result(conn, stock_check_result: StockCheckResult, item: Item, main_thread_loop, stock_check_time: datetime, bot):
+# stores the result and queues it for the bot to notify the item's subscribers, so stock checks can run outside of the bot's process.
+# The writes are buffered and committed with the rest of the stock check cycle's writes
+def handle_stock_check_result(conn, stock_check_result: StockCheckResult, item: Item, stock_check_time: datetime):
     item.item_name = stock_check_result.item_name if stock_check_result.item_name is not None and stock_check_result.item_name != "" else item.item_name
     item.last_stock_check = stock_check_time
     stock_check_result.item_name = item.item_name
@@ -28,15 +30,23 @@ def handle_stock_check_result(conn, stock_check_result: StockCheckResult, item:
         stock_check_result.fail_count = 0
 
     if item.last_stock_check_result != stock_check_result:
-        sql_item_persistence.sqlite_item_persistence.insert_price_history(conn, stock_check_result, int(item.last_stock_check.timestamp()))
+        sql_item_persistence.sqlite_item_persistence.insert_price_history(conn, stock_check_result, int(item.last_stock_check.timestamp()), is_write_behind=True)
 
+    is_item_unchanged = is_stock_check_result_unchanged(item.last_stock_check_result, stock_check_result)
     item.stock_status = stock_check_result.is_in_stock
     item.last_stock_check_result = stock_check_result
-    sql_item_persistence.sqlite_item_persistence.upsert_item(conn, item)
-    subscribed_users = sql_item_persistence.sqlite_item_persistence.get_subscribed_users_for_item(conn, item)
+    if is_item_unchanged:
+        # subscribers were already notified of this exact result, so there is nothing to queue for them
+        sql_item_persistence.sqlite_item_persistence.update_stock_check_time(conn, item.url, int(item.last_stock_check.timestamp()), is_write_behind=True)
+    else:
+        sql_item_persistence.sqlite_item_persistence.upsert_item(conn, item, is_write_behind=True)
+        sql_item_persistence.sqlite_item_persistence.enqueue_stock_check_event(conn, item, stock_check_result, is_write_behind=True)
 
-    for subscribed_user in subscribed_users:
-        asyncio.run_coroutine_threadsafe(notify_valid_subscribers(subscribed_user, item, stock_check_result, bot), main_thread_loop)
+def is_stock_check_result_unchanged(last_stock_check_result: Optional[StockCheckResult], stock_check_result: StockCheckResult) -> bool:
+    return last_stock_check_result is not None and \
+           last_stock_check_result == stock_check_result and \
+           last_stock_check_result.fail_count == stock_check_result.fail_count and \
+           last_stock_check_result.item_name == stock_check_result.item_name
 
 async def send_message(user_id, message, bot):
     logging.info(f"Sending message: {message}")
@@ -51,7 +61,8 @@ async def send_message(user_id, message, bot):
             logging.error(e)
             logging.error(traceback.format_exc(limit=5))
 
-async def notify_valid_subscribers(subscribed_user: NotificationUser, item: Item, stock_result: StockCheckResult, bot):
+# returns whether the subscriber was unsubscribed
+async def notify_valid_subscribers(subscribed_user: NotificationUser, item: Item, stock_result: StockCheckResult, bot) -> bool:
     is_unsubscribed = False
     if item.item_name != subscribed_user.item_name:
         subscribed_user.item_name = item.item_name
@@ -73,9 +84,10 @@ async def notify_valid_subscribers(subscribed_user: NotificationUser, item: Item
                 await send_message(ADMINISTRATOR_ID, f'The bot has been banned from {website.value} and url {stock_result.item_url}', bot)
 
     if not is_unsubscribed:
-        await discord_user_service.upsert_user(subscribed_user)
+        await discord_user_service.update_user_notification_state(subscribed_user)
     else:
         await discord_user_service.unsubscribe(stock_result.item_url, subscribed_user)
+    return is_unsubscribed
 
 def handle_available_stock_check_result(subscribed_user: NotificationUser, item: Item, stock_check_result: StockCheckResult):
     messages = []
@@ -1,11 +1,16 @@
+import asyncio
+import hashlib
 import logging
 import traceback
+from typing import Optional, List
 
 import aiohttp
-from aiohttp import ClientSession
-import asyncio
-
 from model.user_exception import UserException
+from services.client_session_service import ClientSessionManager
+from services.parse_worker_service import run_parse
+from services.response_cache import CachedResponse
+from services.single_flight import single_flight
+from settings.settings import STREAMING_READ_WEBSITES, STREAM_CHUNK_SIZE, STREAM_TAIL_BYTES
 from stock_checkers.abstract_stock_checker import AbstractStockChecker
 from stock_checkers.stock_check_result import StockCheckResult
 import lxml.html
@@ -29,24 +34,31 @@ class AbstractRequestStockChecker(AbstractStockChecker):
     def get_item_name(self, doc) -> str:
         return doc.find(".//title").text.strip()
 
-    def get_item_name_thread(self, response) -> str:
+    # the name is not needed for a valid stock check result, a page without one keeps the item's stored name
+    def get_item_name_or_empty(self, doc) -> str:
+        try:
+            return self.get_item_name(doc)
+        except Exception as e:
+            logging.error(f"Could not read the item name: {e}")
+            return ""
+
+    def get_item_name_from_response(self, response) -> str:
         doc = lxml.html.fromstring(response)
         return self.get_item_name(doc)
 
-    async def get_item_name_from_url(self, url, executor):
-        session = aiohttp.ClientSession()
+    async def fetch_item_name(self, url, session_manager: ClientSessionManager) -> str:
+        response = await self.fetch(session_manager, url)
+        return await run_parse(self.get_item_name_from_response, response)
+
+    # concurrent lookups of the same url, such as many users subscribing to the same item, share one request
+    async def get_item_name_from_url(self, url, session_manager: ClientSessionManager):
         item_name = ""
         try:
-            response = await self.fetch(session, url)
-            loop = asyncio.get_running_loop()
-            item_name = await loop.run_in_executor(executor, self.get_item_name_thread, response)
+            item_name = await single_flight.run("item_name", url, self.fetch_item_name, url, session_manager)
         except Exception as e:
             logging.error(traceback.format_exc())
             logging.error(e)
             raise UserException(f"Could not subscribe to {url}, it was invalid")
-        finally:
-            session.cookie_jar.clear()
-            await session.close()
 
         return item_name
 
@@ -58,33 +70,153 @@ class AbstractRequestStockChecker(AbstractStockChecker):
         headers_copy["user-agent"] = get_random_user_agent()
         return headers_copy
 
-    async def check_stock(self, item_url: str) -> StockCheckResult:
+    # headers to use when fetching the page to check stock, None to use the base headers with a random user agent
+    def get_stock_check_headers(self):
+        return None
+
+    # runs in a parse worker process so the checker must stay picklable,
+    # errors should be handled here so that a partially parsed result is still returned
+    def parse_stock_check_result(self, item_url: str, response_text: str) -> StockCheckResult:
         pass
 
-    async def fetch(self, session: ClientSession, url, header_override = None):
-        timeout = aiohttp.ClientTimeout(total=100)
-        headers = header_override if header_override is not None else self.get_headers()
-        async with session.get(url, headers=headers, timeout=timeout) as response:
-            try:
-                text = await response.text()
-                response.raise_for_status()
-                return text
-            except Exception as e:
-                logging.error(text)
-                logging.error(traceback.format_exc())
-                logging.error(e)
-                raise e
-
-    async def post(self, session: ClientSession, url, data, header_override = None):
-        timeout = aiohttp.ClientTimeout(total=100)
+    # markers that all appear in the page once every field the checker needs has been read,
+    # an empty list means the whole page is always read
+    def get_stream_end_markers(self) -> List[bytes]:
+        return []
+
+    def is_streaming_read_enabled(self, url: str) -> bool:
+        return not not self.get_stream_end_markers() and ClientSessionManager.get_domain(url) in STREAMING_READ_WEBSITES
+
+    # reads the page in chunks until every end marker and a tail after the last one have been read, then closes the
+    # connection so the rest of the page is not downloaded. Pages missing a marker are read to the end.
+    async def read_until_end_markers(self, response) -> str:
+        markers = self.get_stream_end_markers()
+        max_marker_length = max(map(len, markers))
+        marker_end_positions = {}
+        body = bytearray()
+        read_until_length = None
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            search_start = max(len(body) - max_marker_length + 1, 0)
+            body.extend(chunk)
+            for marker in markers:
+                if marker not in marker_end_positions:
+                    marker_position = body.find(marker, search_start)
+                    if marker_position != -1:
+                        marker_end_positions[marker] = marker_position + len(marker)
+            if read_until_length is None and len(marker_end_positions) == len(markers):
+                read_until_length = max(marker_end_positions.values()) + STREAM_TAIL_BYTES
+            if read_until_length is not None and len(body) >= read_until_length:
+                logging.info(f"Stopped reading {response.url} after {read_until_length} bytes")
+                response.close()
+                del body[read_until_length:]
+                break
+        return body.decode(response.charset or "utf-8", errors="replace")
+
+    # the part of the page that decides the stock check result, a page with the same fingerprint is not parsed again
+    def get_fingerprint_region(self, response_text: str) -> str:
+        return response_text
+
+    # the page from the start marker up to and including the end marker after it, the rest of the page if the end
+    # marker is missing and nothing if the start marker is missing
+    @staticmethod
+    def get_region(response_text: str, start_marker: str, end_marker: str) -> str:
+        start = response_text.find(start_marker)
+        if start == -1:
+            return ""
+        end = response_text.find(end_marker, start + len(start_marker))
+        return response_text[start:] if end == -1 else response_text[start:end + len(end_marker)]
+
+    def get_fingerprint(self, response_text: str) -> str:
+        return hashlib.blake2b(self.get_fingerprint_region(response_text).encode(), digest_size=16).hexdigest()
+
+    # concurrent stock checks of the same url in this process share one request. Subscribing runs in the bot's process
+    # and the stock check loops in the checker workers, but subscribing only checks items that have no stored result
+    async def check_stock(self, item_url: str, session_manager: ClientSessionManager) -> StockCheckResult:
+        return await single_flight.run("stock_check", item_url, self.fetch_stock_check_result, item_url, session_manager)
+
+    async def fetch_stock_check_result(self, item_url: str, session_manager: ClientSessionManager) -> StockCheckResult:
+        stock_check_result = StockCheckResult.create_default(item_url)
+        cached_response = session_manager.response_cache.get(item_url)
+        try:
+            response_text, response_headers = await self.fetch_if_modified(
+                session_manager,
+                item_url,
+                cached_response,
+                header_override=self.get_stock_check_headers(),
+                is_streaming=self.is_streaming_read_enabled(item_url))
+            if response_text is None:
+                logging.info(f"{item_url} was not modified since the last stock check")
+                return cached_response.get_stock_check_result()
+
+            fingerprint = self.get_fingerprint(response_text)
+            if cached_response is not None and cached_response.fingerprint == fingerprint:
+                logging.info(f"{item_url} has the same content as the last stock check")
+                return cached_response.get_stock_check_result()
+
+            stock_check_result = await run_parse(self.parse_stock_check_result, item_url, response_text)
+            if stock_check_result.is_item_available:
+                session_manager.response_cache.put(item_url, CachedResponse(
+                    response_headers.get("ETag"),
+                    response_headers.get("Last-Modified"),
+                    fingerprint,
+                    stock_check_result))
+            else:
+                session_manager.response_cache.remove(item_url)
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            logging.error(e)
+            stock_check_result.is_request_failure = self.is_request_failure(e)
+
+        return stock_check_result
+
+    # timeouts, connection errors and responses refusing or failing the request, a page that is not found is an invalid item
+    @staticmethod
+    def is_request_failure(e: Exception) -> bool:
+        if isinstance(e, aiohttp.ClientResponseError):
+            return e.status in (403, 429) or e.status >= 500
+        return isinstance(e, (asyncio.TimeoutError, aiohttp.ClientError))
+
+    async def fetch(self, session_manager: ClientSessionManager, url, header_override = None):
+        response_text, _ = await self.fetch_if_modified(session_manager, url, None, header_override)
+        return response_text
+
+    # returns None for the text if the server responded that the page was not modified since the cached response
+    async def fetch_if_modified(self, session_manager: ClientSessionManager, url, cached_response: Optional[CachedResponse], header_override = None, is_streaming = False):
+        timeout = session_manager.get_timeout(url)
+        headers = (header_override if header_override is not None else self.get_headers()).copy()
+        if cached_response is not None:
+            if cached_response.etag is not None:
+                headers["If-None-Match"] = cached_response.etag
+            if cached_response.last_modified is not None:
+                headers["If-Modified-Since"] = cached_response.last_modified
+        session = session_manager.get_session(url)
+        async with session_manager.get_request_limiter(url):
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                text = ""
+                try:
+                    if response.status == 304 and cached_response is not None:
+                        return None, response.headers
+                    text = await self.read_until_end_markers(response) if is_streaming else await response.text()
+                    response.raise_for_status()
+                    return text, response.headers
+                except Exception as e:
+                    logging.error(text)
+                    logging.error(traceback.format_exc())
+                    logging.error(e)
+                    raise e
+
+    async def post(self, session_manager: ClientSessionManager, url, data, header_override = None):
+        timeout = session_manager.get_timeout(url)
         headers = header_override if header_override is not None else self.get_headers()
-        async with session.post(url, data=data, headers=headers, timeout=timeout) as response:
-            try:
-                text = await response.text()
-                response.raise_for_status()
-                return text
-            except Exception as e:
-                logging.error(text)
-                logging.error(traceback.format_exc())
-                logging.error(e)
-                raise e
\ No newline at end of file
+        session = session_manager.get_session(url)
+        async with session_manager.get_request_limiter(url):
+            async with session.post(url, data=data, headers=headers, timeout=timeout) as response:
+                try:
+                    text = await response.text()
+                    response.raise_for_status()
+                    return text
+                except Exception as e:
+                    logging.error(text)
+                    logging.error(traceback.format_exc())
+                    logging.error(e)
+                    raise e
\ No newline at end of file
@@ -1,9 +1,23 @@
+from typing import List, Tuple
+
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
+
+from settings.settings import SELENIUM_ELEMENT_WAIT_TIMEOUT
 from stock_checkers.abstract_stock_checker import AbstractStockChecker
 from stock_checkers.stock_check_result import StockCheckResult
 
 class AbstractSeleniumStockChecker(AbstractStockChecker):
+    # (By, value) locators of every element check_stock reads, the page is only waited on until they are all present
+    # since pages are not fully loaded and images, fonts and stylesheets may be blocked
+    def get_required_element_locators(self) -> List[Tuple[str, str]]:
+        return []
+
     def wait_for_page_rendered(self, driver):
-        pass
+        locators = self.get_required_element_locators()
+        if locators:
+            WebDriverWait(driver, SELENIUM_ELEMENT_WAIT_TIMEOUT).until(
+                lambda d: all(expected_conditions.presence_of_element_located(locator)(d) for locator in locators))
 
     def check_stock(self, driver, item_url) -> StockCheckResult:
         pass
\ No newline at end of file
@@ -5,5 +5,5 @@ class AbstractStockChecker:
     def get_item_name(self, driver) -> str:
         pass
 
-    async def get_item_name_from_url(self, url, executor):
+    async def get_item_name_from_url(self, url, session_manager):
         return ""
\ No newline at end of file
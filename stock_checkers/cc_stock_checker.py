@@ -1,9 +1,10 @@
 import logging
 import re
 import traceback
+from typing import List
 
-import aiohttp
 import lxml.html
+from lxml import etree
 
 from conversions.conversions import get_float_from_price_str
 from model.user_exception import UserException
@@ -22,6 +23,23 @@ base_headers = {
     'Accept-Language': 'en-GB,en-US;q=0.9,en;q=0.8'
 }
 
+stores_to_check = [{'store_location': 'Burnaby', 'attribute_name': 'a'},
+                   {'store_location': 'Coquitlam', 'attribute_name': 'a'},
+                   {'store_location': 'Grandview', 'attribute_name': 'a'},
+                   {'store_location': 'Richmond', 'attribute_name': 'a'},
+                   {'store_location': 'Vancouver Broadway', 'attribute_name': 'a'},
+                   {'store_location': 'Online Store', 'attribute_name': 'p'}]
+
+# checking if id codes exist
+item_codes_xpath = etree.XPath("//p[contains(@class, 'm-0 text-small')]")
+# the price is the last strong of the first price block, which does not depend on how much of the page was read
+price_blocks_xpath = etree.XPath("//div[contains(@class, 'order-md-1')][.//strong]")
+store_xpaths = {store['store_location']: etree.XPath(f"//{store['attribute_name']}[text() = '{store['store_location']}']") for store in stores_to_check}
+# the price block and every store name, the fields the checker needs are all read a short tail after the last of them
+required_markers = ["order-md-1", *[f">{store['store_location']}<" for store in stores_to_check]]
+stock_number_xpath = etree.XPath("../../..//span[@class = 'stocknumber']")
+strong_xpath = etree.XPath(".//strong")
+
 class CanadaComputersStockChecker(AbstractRequestStockChecker):
     def to_stock_check_url(self, url: str, domain: str, suffix: str):
         try:
@@ -45,18 +63,17 @@ class CanadaComputersStockChecker(AbstractRequestStockChecker):
 
     @staticmethod
     def assert_is_item(doc):
-        # checking if id codes exist
-        if not doc.xpath("//p[contains(@class, 'm-0 text-small')]"):
+        if not item_codes_xpath(doc):
             raise Exception("The item was not valid")
 
     @staticmethod
-    def get_in_stock_by_store_name(doc, attribute_name: str, store_name: str):
+    def get_in_stock_by_store_name(doc, store_name: str):
         try:
-            element = doc.xpath(f"//{attribute_name}[text() = '{store_name}']/../../..//span[@class = 'stocknumber']")[0]
+            element = stock_number_xpath(store_xpaths[store_name](doc)[0])[0]
             if element.text:
                 stock_str = element.text.strip()
             else:
-                stock_str = element.xpath(".//strong")[0].text.strip()
+                stock_str = strong_xpath(element)[0].text.strip()
             stock_count = int(stock_str.split('+')[0])
             return stock_count > 0
         except:
@@ -64,31 +81,42 @@ class CanadaComputersStockChecker(AbstractRequestStockChecker):
 
     @staticmethod
     def get_price(doc):
-        price_str = doc.xpath("//div[contains(@class, 'order-md-1')]//strong")[-1].text.strip()
+        price_str = strong_xpath(price_blocks_xpath(doc)[0])[-1].text.strip()
         price = get_float_from_price_str(price_str)
         return price
 
-    async def check_stock(self, item_url: str) -> StockCheckResult:
-        stores_to_check = [{'store_location': 'Burnaby', 'attribute_name': 'a'},
-                           {'store_location': 'Coquitlam', 'attribute_name': 'a'},
-                           {'store_location': 'Grandview', 'attribute_name': 'a'},
-                           {'store_location': 'Richmond', 'attribute_name': 'a'},
-                           {'store_location': 'Vancouver Broadway', 'attribute_name': 'a'},
-                           {'store_location': 'Online Store', 'attribute_name': 'p'}]
+    def get_stream_end_markers(self) -> List[bytes]:
+        return [marker.encode() for marker in required_markers]
+
+    # the title, the item code and the page from the price block up to the stock count after the last store name,
+    # so related products and tokens further down the page are left out. Pages missing one of them are used whole
+    def get_fingerprint_region(self, response_text: str) -> str:
+        positions = [response_text.find(marker) for marker in required_markers]
+        if -1 in positions:
+            return response_text
+        first_stock_number_start = response_text.find("stocknumber")
+        stores_start = min(positions) if first_stock_number_start == -1 else min(*positions, first_stock_number_start)
+        last_marker_end = max(position + len(marker) for position, marker in zip(positions, required_markers))
+        last_stock_number_start = response_text.find("stocknumber", last_marker_end)
+        stores_end = -1 if last_stock_number_start == -1 else response_text.find("</span>", last_stock_number_start)
+        stores_end = len(response_text) if stores_end == -1 else stores_end + len("</span>")
+        return "\n".join([
+            self.get_region(response_text, "<title", "</title>"),
+            self.get_region(response_text, "m-0 text-small", "</p>"),
+            response_text[stores_start:stores_end]])
 
+    def parse_stock_check_result(self, item_url: str, response_text: str) -> StockCheckResult:
         stock_check_result = StockCheckResult.create_default(item_url)
-        session = aiohttp.ClientSession()
 
         try:
-            request_response = await self.fetch(session, item_url)
-            doc = lxml.html.fromstring(request_response)
+            doc = lxml.html.fromstring(response_text)
             self.assert_is_item(doc)
-            stock_check_result.item_name = self.get_item_name(doc)
+            stock_check_result.item_name = self.get_item_name_or_empty(doc)
             stock_check_result.is_item_available = True
             price = CanadaComputersStockChecker.get_price(doc)
             stock_check_result.set_all_prices(price)
             for store in stores_to_check:
-                in_stock = CanadaComputersStockChecker.get_in_stock_by_store_name(doc, store['attribute_name'], store['store_location'])
+                in_stock = CanadaComputersStockChecker.get_in_stock_by_store_name(doc, store['store_location'])
                 if in_stock:
                     stock_check_result.is_in_stock = True
                     stock_check_result.in_stock_stores.append(store['store_location'])
@@ -96,7 +124,5 @@ class CanadaComputersStockChecker(AbstractRequestStockChecker):
         except Exception as e:
             logging.error(traceback.format_exc())
             logging.error(e)
-        finally:
-            await session.close()
 
         return stock_check_result
\ No newline at end of file
@@ -1,8 +1,9 @@
 import logging
 import traceback
+from typing import List
 
-import aiohttp
 import lxml.html
+from lxml import etree
 
 from conversions.price_formatters import extract_price
 from stock_checkers.abstract_request_stock_checker import AbstractRequestStockChecker
@@ -21,6 +22,11 @@ base_headers = {
     'accept-language': 'en-GB,en;q=0.9'
 }
 
+price_xpath = etree.XPath("//span[@id='LFrame_spanFinalPrice']")
+add_to_cart_button_xpath = etree.XPath("//a[@id='LFrame_btnAddToCart']")
+strong_xpath = etree.XPath(".//strong")
+sup_xpath = etree.XPath(".//sup")
+
 class EVGAStockChecker(AbstractRequestStockChecker):
     def to_stock_check_url(self, url: str, domain: str, suffix: str):
         return url
@@ -30,27 +36,39 @@ class EVGAStockChecker(AbstractRequestStockChecker):
 
     @staticmethod
     def get_price(doc) -> float:
-        whole_number_portion = doc.xpath("//span[@id='LFrame_spanFinalPrice']//strong")[0].text
-        decimal_portion = doc.xpath("//span[@id='LFrame_spanFinalPrice']//sup")[0].text
+        price_element = price_xpath(doc)[0]
+        whole_number_portion = strong_xpath(price_element)[0].text
+        decimal_portion = sup_xpath(price_element)[0].text
         return extract_price(f'{whole_number_portion}{decimal_portion}')
 
     @staticmethod
     def get_is_in_stock(doc) -> bool:
-        return not not doc.xpath("//a[@id='LFrame_btnAddToCart']")
+        return not not add_to_cart_button_xpath(doc)
+
+    # the add to cart button only exists when in stock, so out of stock pages are always read to the end
+    def get_stream_end_markers(self) -> List[bytes]:
+        return [b"LFrame_spanFinalPrice", b"LFrame_btnAddToCart"]
+
+    # the title, the price and the add to cart button, which only exists when in stock
+    def get_fingerprint_region(self, response_text: str) -> str:
+        return "\n".join([
+            self.get_region(response_text, "<title", "</title>"),
+            self.get_region(response_text, "LFrame_spanFinalPrice", "</span>"),
+            self.get_region(response_text, "LFrame_btnAddToCart", ">")])
+
+    def get_stock_check_headers(self):
+        return base_headers
 
-    async def check_stock(self, item_url: str) -> StockCheckResult:
+    def parse_stock_check_result(self, item_url: str, response_text: str) -> StockCheckResult:
         stock_check_result = StockCheckResult.create_default(item_url)
-        session = aiohttp.ClientSession()
         try:
-            response_text = await self.fetch(session, item_url, header_override=base_headers)
             doc = lxml.html.fromstring(response_text)
             stock_check_result.set_all_prices(self.get_price(doc))
             stock_check_result.is_in_stock = self.get_is_in_stock(doc)
             stock_check_result.is_item_available = True
+            stock_check_result.item_name = self.get_item_name_or_empty(doc)
         except Exception as e:
             logging.error(traceback.format_exc())
             logging.error(e)
-        finally:
-            await session.close()
 
         return stock_check_result
@@ -1,34 +1,36 @@
 import logging
 import traceback
 
-import aiohttp
 import lxml.html
+from lxml import etree
 
 from conversions.conversions import str2size
 from conversions.price_formatters import extract_price
 from stock_checkers.abstract_request_stock_checker import AbstractRequestStockChecker
 from stock_checkers.stock_check_result import StockCheckResult
 
+price_xpath = etree.XPath("//span[@data-product-price]")
+available_sizes_xpath = etree.XPath("//select[@id='SingleOptionSelector-1']/option[not(@disabled)]")
+
 class PrincessPollyStockChecker(AbstractRequestStockChecker):
     def to_stock_check_url(self, url: str, domain: str, suffix: str):
         return url.split("?")[0]
 
     @staticmethod
     def get_price(doc) -> float:
-        return extract_price(doc.xpath("//span[@data-product-price]")[0].text)
+        return extract_price(price_xpath(doc)[0].text)
 
     @staticmethod
     def get_all_available_size_elements(doc):
-        return doc.xpath("//select[@id='SingleOptionSelector-1']/option[not(@disabled)]")
+        return available_sizes_xpath(doc)
 
-    async def check_stock(self, item_url: str) -> StockCheckResult:
+    def parse_stock_check_result(self, item_url: str, response_text: str) -> StockCheckResult:
         stock_check_result = StockCheckResult.create_default(item_url)
-        session = aiohttp.ClientSession()
         try:
-            response_text = await self.fetch(session, item_url)
             doc = lxml.html.fromstring(response_text)
             stock_check_result.set_all_prices(self.get_price(doc))
             stock_check_result.is_item_available = True
+            stock_check_result.item_name = self.get_item_name_or_empty(doc)
             available_size_elements = self.get_all_available_size_elements(doc)
             for available_size_element in available_size_elements:
                 size = str2size(available_size_element.get("value"))
@@ -39,7 +41,5 @@ class PrincessPollyStockChecker(AbstractRequestStockChecker):
         except Exception as e:
             logging.error(traceback.format_exc())
             logging.error(e)
-        finally:
-            await session.close()
 
         return stock_check_result
\ No newline at end of file
@@ -22,7 +22,8 @@ class StockCheckResult:
                  available_sizes: List[str] = None,
                  in_stock_sizes: List[str] = None,
                  in_stock_stores: List[str] = None,
-                 fail_count = 0):
+                 fail_count = 0,
+                 is_request_failure = False):
         self.is_item_available = bool(is_item_available)
         self.item_name = item_name
         self.item_url = item_url
@@ -32,6 +33,8 @@ class StockCheckResult:
         self.in_stock_sizes = [] if in_stock_sizes is None else in_stock_sizes
         self.in_stock_stores = [] if in_stock_stores is None else in_stock_stores
         self.fail_count = fail_count
+        # whether the website could not be reached or refused the request, as opposed to the page not being a valid item
+        self.is_request_failure = is_request_failure
 
     def set_all_official_prices(self, price: float):
         self.stock_price.min_official_price = price
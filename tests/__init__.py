@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# sql_item_persistence opens DB_NAME when it is imported, so the tests point it at a scratch database and give the
+# settings that have no default a value when there is no .env file
+scratch_directory = tempfile.TemporaryDirectory()
+os.environ["DB_NAME"] = os.path.join(scratch_directory.name, "test.db")
+os.environ.setdefault("DB_PASSWORD", "test")
+os.environ.setdefault("SELENIUM_TIME_THRESHOLD", "30")
+os.environ.setdefault("REQUESTS_TIME_THRESHOLD", "30")
+os.environ.setdefault("SELENIUM_CREATE_NEW_BROWSER_INTERVAL", "600")
+os.environ.setdefault("OFFSET_BETWEEN_FAILS", "60")
+os.environ.setdefault("ADMINISTRATOR_ID", "0")
+# buffered writes are only flushed by the tests themselves
+os.environ["WRITE_BEHIND_FLUSH_INTERVAL"] = "3600"
\ No newline at end of file
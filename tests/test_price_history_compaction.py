@@ -0,0 +1,78 @@
+import importlib.util
+import sqlite3
+import unittest
+from copy import copy
+
+import sql_migrations
+from model.price_history_rollup import HOUR, DAY
+from sql_dictionary import SqlDictionary
+from sql_write_behind_buffer import WriteBehindBuffer
+from stock_checkers.stock_check_result import StockCheckResult
+from stock_checkers.stock_price import StockPrice
+
+has_sqlcipher = importlib.util.find_spec("pysqlcipher3") is not None
+if has_sqlcipher:
+    from sql_item_persistence import sqlite_item_persistence
+
+item_urls = [f"https://www.canadacomputers.com/product_info.php?item_id={i}" for i in range(3)]
+day_start = 1700006400
+stock_check_interval = 20 * 60
+stock_checks = 90
+
+# Checks that compacting price histories in small batches as they age, which merges new summaries into the rollups
+# of earlier batches, leaves the same rollups as compacting them all at once
+@unittest.skipUnless(has_sqlcipher, "pysqlcipher3 is not installed")
+class PriceHistoryCompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.conns = []
+
+    def tearDown(self):
+        for conn in self.conns:
+            conn.close()
+
+    def create_database(self):
+        conn = sqlite3.connect(":memory:")
+        self.conns.append(conn)
+        sql_migrations.migrate(conn)
+        conn.isolation_level = ""
+        # dictionary ids are cached per database, so each scratch database gets its own dictionaries
+        persistence = copy(sqlite_item_persistence)
+        persistence.size_dictionary = SqlDictionary("sizes", "size")
+        persistence.store_dictionary = SqlDictionary("stores", "store")
+        persistence.write_behind_buffer = WriteBehindBuffer()
+        # every item is checked every 20 minutes, out of stock one check in three and at a price that keeps changing
+        for i in range(stock_checks):
+            for item_url in item_urls:
+                price = 100.0 + i % 5
+                stock_check_result = StockCheckResult(True, "Graphics card", item_url, StockPrice(price, f"${price:.2f}", price, f"${price:.2f}"), i % 3 != 2)
+                persistence.insert_price_history(conn, stock_check_result, day_start + i * stock_check_interval)
+        return conn, persistence
+
+    @staticmethod
+    def compact(conn, persistence, raw_cutoff_time: int, max_items: int):
+        after_item_url = ""
+        while after_item_url is not None:
+            after_item_url = persistence.compact_price_histories(conn, after_item_url, raw_cutoff_time, max_items)
+
+    @staticmethod
+    def get_all(conn, table: str):
+        return conn.execute(f"SELECT * from {table} ORDER BY 1, 2, 3").fetchall()
+
+    @staticmethod
+    def get_rollup(conn, period: str, period_start: int):
+        return conn.execute("SELECT change_count, in_stock_seconds, min_price_str from price_history_rollups WHERE item_url = ? AND period = ? AND period_start = ?",
+                            (item_urls[0], period, period_start)).fetchone()
+
+    def test_incremental_compaction_merges_rollups(self):
+        incremental_conn, incremental_persistence = self.create_database()
+        # cutoffs in the middle of hours and of the first day, so their rollups are summarized over several batches
+        for raw_cutoff_time in [day_start + 5 * 3600 + 1800, day_start + 23 * 3600 + 1800, day_start + 29 * 3600 + 1800]:
+            self.compact(incremental_conn, incremental_persistence, raw_cutoff_time, 1)
+        all_at_once_conn, all_at_once_persistence = self.create_database()
+        self.compact(all_at_once_conn, all_at_once_persistence, day_start + 29 * 3600 + 1800, len(item_urls))
+
+        self.assertEqual(self.get_all(all_at_once_conn, "price_history_rollups"), self.get_all(incremental_conn, "price_history_rollups"))
+        self.assertEqual(self.get_all(all_at_once_conn, "price_history"), self.get_all(incremental_conn, "price_history"))
+
+        self.assertEqual((3, 2 * stock_check_interval, "$100.00"), self.get_rollup(incremental_conn, HOUR, day_start + 5 * 3600))
+        self.assertEqual((72, 48 * stock_check_interval, "$100.00"), self.get_rollup(incremental_conn, DAY, day_start))
\ No newline at end of file
@@ -0,0 +1,95 @@
+import importlib.util
+import json
+import math
+import sqlite3
+import unittest
+from copy import copy
+from datetime import datetime, timezone
+
+import sql_migrations
+from sql_dictionary import SqlDictionary
+from sql_write_behind_buffer import WriteBehindBuffer
+from stock_checkers.stock_check_result import StockCheckResult
+from stock_checkers.stock_price import StockPrice
+
+has_sqlcipher = importlib.util.find_spec("pysqlcipher3") is not None
+if has_sqlcipher:
+    from sql_item_persistence import sqlite_item_persistence
+
+first_item_url = "https://www.canadacomputers.com/product_info.php?item_id=1"
+second_item_url = "https://www.evga.com/products/product.aspx?pn=2"
+
+# Checks that price histories stored as json before the price history normalization migration read back the same after it
+@unittest.skipUnless(has_sqlcipher, "pysqlcipher3 is not installed")
+class PriceHistoryMigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        cursor = self.conn.cursor()
+        sql_migrations.create_tables(cursor)
+        sql_migrations.create_hot_query_indexes(cursor)
+        cursor.execute("PRAGMA user_version = 2")
+        # dictionary ids are cached per database, so the scratch database gets its own dictionaries
+        self.persistence = copy(sqlite_item_persistence)
+        self.persistence.size_dictionary = SqlDictionary("sizes", "size")
+        self.persistence.store_dictionary = SqlDictionary("stores", "store")
+        self.persistence.write_behind_buffer = WriteBehindBuffer()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def insert_json_price_history(self, item_url: str, stock_check_time: int, stock_check_result_json: str):
+        self.conn.execute("INSERT INTO price_history VALUES (?, ?, ?)", (item_url, stock_check_time, stock_check_result_json))
+
+    # sizes and stores come back in the order they were first seen across the database
+    def assert_stock_check_result(self, expected: StockCheckResult, actual: StockCheckResult):
+        self.assertEqual(expected.is_item_available, actual.is_item_available)
+        self.assertEqual(expected.item_name, actual.item_name)
+        self.assertEqual(expected.item_url, actual.item_url)
+        self.assertEqual(expected.is_in_stock, actual.is_in_stock)
+        self.assertEqual(expected.stock_price.min_price, actual.stock_price.min_price)
+        self.assertEqual(expected.stock_price.min_price_str, actual.stock_price.min_price_str)
+        self.assertEqual(expected.stock_price.min_official_price, actual.stock_price.min_official_price)
+        self.assertEqual(expected.stock_price.min_official_price_str, actual.stock_price.min_official_price_str)
+        self.assertCountEqual(expected.available_sizes, actual.available_sizes)
+        self.assertCountEqual(expected.in_stock_sizes, actual.in_stock_sizes)
+        self.assertCountEqual(expected.in_stock_stores, actual.in_stock_stores)
+        self.assertEqual(expected.fail_count, actual.fail_count)
+
+    def test_json_price_histories_round_trip(self):
+        in_stock_result = StockCheckResult(True, "Shirt", first_item_url, StockPrice(10.5, "$10.50", math.inf, ""), True,
+                                           ["S", "M", "L"], ["M", "L"], ["Toronto"])
+        failed_result = StockCheckResult(False, "", first_item_url, StockPrice.create_default(), False, fail_count=2)
+        other_result = StockCheckResult(True, "Graphics card", second_item_url, StockPrice(799.99, "$799.99", 749.99, "$749.99"), True,
+                                        ["L", "XL"], ["XL"], ["Ottawa", "Toronto"], 1)
+        self.insert_json_price_history(first_item_url, 1000, in_stock_result.to_json())
+        self.insert_json_price_history(first_item_url, 2000, failed_result.to_json())
+        self.insert_json_price_history(second_item_url, 1500, other_result.to_json())
+
+        sql_migrations.migrate(self.conn)
+        url_to_price_histories = self.persistence.get_latest_price_histories(self.conn, [first_item_url, second_item_url], 10)
+
+        first_price_histories = url_to_price_histories[first_item_url]
+        self.assertEqual([datetime.fromtimestamp(2000, tz=timezone.utc), datetime.fromtimestamp(1000, tz=timezone.utc)],
+                         [price_history.stock_check_time for price_history in first_price_histories])
+        self.assert_stock_check_result(failed_result, first_price_histories[0].stock_check_result)
+        self.assert_stock_check_result(in_stock_result, first_price_histories[1].stock_check_result)
+        self.assert_stock_check_result(other_result, url_to_price_histories[second_item_url][0].stock_check_result)
+
+    # price histories stored before fail_count existed, or with no sizes or stores, have them as missing or null
+    def test_json_price_histories_without_optional_fields(self):
+        stock_check_result_json = json.dumps({
+            "is_item_available": True,
+            "item_name": "Dress",
+            "item_url": first_item_url,
+            "stock_price": {"min_price": 45.0, "min_price_str": "$45.00", "min_official_price": 45.0, "min_official_price_str": "$45.00"},
+            "is_in_stock": True,
+            "available_sizes": None,
+            "in_stock_sizes": None,
+        })
+        self.insert_json_price_history(first_item_url, 1000, stock_check_result_json)
+
+        sql_migrations.migrate(self.conn)
+        price_history = self.persistence.get_latest_price_histories(self.conn, [first_item_url], 10)[first_item_url][0]
+
+        expected = StockCheckResult(True, "Dress", first_item_url, StockPrice(45.0, "$45.00", 45.0, "$45.00"), True)
+        self.assert_stock_check_result(expected, price_history.stock_check_result)
\ No newline at end of file
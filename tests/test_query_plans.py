@@ -0,0 +1,44 @@
+import sqlite3
+import unittest
+
+import sql_migrations
+
+# the hot queries of sql_item_persistence, which cannot be imported here as it opens the configured database
+subscribed_users_query = "SELECT * from users WHERE item_url IN (?, ?)"
+items_by_website_query = "SELECT * from items WHERE website IN (?) AND EXISTS (SELECT 1 FROM users WHERE items.item_url = item_url)"
+latest_price_histories_query = "SELECT * from price_history WHERE item_url = ? ORDER BY stock_check_time DESC LIMIT ?"
+price_history_change_counts_query = "SELECT item_url, COUNT(*) from price_history INDEXED BY price_history_stock_check_time WHERE stock_check_time >= ? GROUP BY item_url"
+
+# Checks that the hot queries keep using their indexes on a fully migrated database
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        sql_migrations.migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def get_query_plan(self, query: str, values: tuple) -> str:
+        return "\n".join(row[3] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {query}", values))
+
+    def test_subscribed_users_use_item_url_index(self):
+        query_plan = self.get_query_plan(subscribed_users_query, ("a", "b"))
+        self.assertIn("SEARCH users USING INDEX users_item_url", query_plan)
+
+    def test_items_use_website_index(self):
+        query_plan = self.get_query_plan(items_by_website_query, ("canadacomputers",))
+        self.assertIn("SEARCH items USING INDEX items_website (website=?)", query_plan)
+        self.assertIn("SEARCH users USING COVERING INDEX users_item_url", query_plan)
+
+    def test_latest_price_histories_search_primary_key(self):
+        query_plan = self.get_query_plan(latest_price_histories_query, ("a", 10))
+        self.assertIn("SEARCH price_history USING INDEX sqlite_autoindex_price_history_1 (item_url=?)", query_plan)
+        self.assertNotIn("TEMP B-TREE", query_plan)
+
+    def test_price_history_change_counts_search_recent_price_histories(self):
+        query_plan = self.get_query_plan(price_history_change_counts_query, (0,))
+        self.assertIn("SEARCH price_history USING COVERING INDEX price_history_stock_check_time (stock_check_time>?)", query_plan)
+
+    def test_stock_check_time_is_not_indexed(self):
+        indexes = [row[0] for row in self.conn.execute("SELECT name from sqlite_master WHERE type = 'index' AND tbl_name = 'items'")]
+        self.assertNotIn("items_website_last_stock_check", indexes)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import importlib.util
+import sqlite3
+import unittest
+from copy import copy
+
+from settings.settings import WRITE_BEHIND_MAX_ATTEMPTS
+from sql_write_behind_buffer import WriteBehindBuffer
+
+has_sqlcipher = importlib.util.find_spec("pysqlcipher3") is not None
+if has_sqlcipher:
+    from sql_item_persistence import sqlite_item_persistence
+
+insert_entry_query = "INSERT INTO entries VALUES (?, ?)"
+
+# Checks that a failed flush keeps its writes ahead of newer ones until it has failed WRITE_BEHIND_MAX_ATTEMPTS times
+class WriteBehindBufferTest(unittest.TestCase):
+    def test_failed_writes_are_retried_before_newer_writes(self):
+        buffer = WriteBehindBuffer()
+        buffer.add(insert_entry_query, (1, "a"))
+        writes = buffer.take_all()
+        buffer.add(insert_entry_query, (2, "b"))
+
+        self.assertTrue(buffer.restore_failed(writes))
+        self.assertEqual([(insert_entry_query, (1, "a")), (insert_entry_query, (2, "b"))], buffer.take_all())
+
+    def test_failed_writes_are_given_up_after_max_attempts(self):
+        buffer = WriteBehindBuffer()
+        buffer.add(insert_entry_query, (1, "a"))
+        for _ in range(WRITE_BEHIND_MAX_ATTEMPTS - 1):
+            self.assertTrue(buffer.restore_failed(buffer.take_all()))
+        self.assertFalse(buffer.restore_failed(buffer.take_all()))
+        self.assertEqual([], buffer.take_all())
+        # the next failure starts counting again
+        buffer.add(insert_entry_query, (1, "a"))
+        self.assertTrue(buffer.restore_failed(buffer.take_all()))
+
+# Checks that flushes retry failed writes and that only the failing write is dropped once they are given up
+@unittest.skipUnless(has_sqlcipher, "pysqlcipher3 is not installed")
+class WriteBehindFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        # the buffer is flushed to whichever connection flushes it, so the scratch database gets its own buffer
+        self.persistence = copy(sqlite_item_persistence)
+        self.persistence.write_behind_buffer = WriteBehindBuffer()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def create_entries_table(self):
+        self.conn.execute("CREATE TABLE entries (id integer PRIMARY KEY, value text NOT NULL)")
+        self.conn.commit()
+
+    def get_entries(self):
+        return self.conn.execute("SELECT * from entries ORDER BY id").fetchall()
+
+    def test_failed_flush_is_retried(self):
+        self.persistence.write(self.conn, insert_entry_query, (1, "a"), is_write_behind=True)
+        with self.assertLogs(level="ERROR"):
+            self.persistence.flush(self.conn)
+        self.create_entries_table()
+        self.persistence.write(self.conn, insert_entry_query, (2, "b"), is_write_behind=True)
+        self.persistence.flush(self.conn)
+
+        self.assertEqual([(1, "a"), (2, "b")], self.get_entries())
+
+    def test_only_failing_write_is_dropped_after_max_attempts(self):
+        self.create_entries_table()
+        for values in [(1, "a"), (2, None), (3, "c")]:
+            self.persistence.write(self.conn, insert_entry_query, values, is_write_behind=True)
+        for _ in range(WRITE_BEHIND_MAX_ATTEMPTS - 1):
+            with self.assertLogs(level="ERROR"):
+                self.persistence.flush(self.conn)
+            self.assertEqual([], self.get_entries())
+
+        with self.assertLogs(level="ERROR") as logs:
+            self.persistence.flush(self.conn)
+        self.assertEqual([(1, "a"), (3, "c")], self.get_entries())
+        self.assertTrue(any("Dropping buffered write" in message and "(2, None)" in message for message in logs.output))
+        self.assertEqual([], self.persistence.write_behind_buffer.take_all())
\ No newline at end of file